@@ -1,6 +1,7 @@
 import typer
 import sqlalchemy
 import os
+import time
 import subprocess
 import docker
 from faker import Faker
@@ -39,5 +40,116 @@ def generate_models():
     run_async(init())
 
 
+@app.command()
+def generate_image_variants(force: bool = False):
+    # Backfills resized copies for images uploaded before variants existed
+    from config import TORTOISE_ORM
+    from models import Images
+    from utils.image_service import make_variants
+
+    async def backfill():
+        await Tortoise.init(config=TORTOISE_ORM)
+        images = Images.all() if force else Images.filter(variants__isnull=True)
+        for image in await images:
+            image.variants = make_variants(image.path)
+            await image.save(update_fields=["variants"])
+            typer.echo(f"{image.path}: {len(image.variants)} variants")
+
+    run_async(backfill())
+
+
+@app.command()
+def hash_image_names():
+    # Images saved before uploads were content hashed move to hashed names,
+    # until then they are served with revalidation instead of as immutable
+    from config import TORTOISE_ORM
+    from models import Images
+    from utils.assets import HASHED_NAME, write_asset
+    from utils.image_service import make_variants, remove_variants
+
+    async def rename():
+        await Tortoise.init(config=TORTOISE_ORM)
+        # Several rows can share a file when the same name was uploaded twice
+        renamed: dict[str, str] = {}
+        for image in await Images.all():
+            if HASHED_NAME.match(image.path):
+                continue
+            if image.path not in renamed:
+                if not os.path.exists(image.path):
+                    typer.echo(f"{image.path}: missing, skipped")
+                    continue
+                with open(image.path, "rb") as f:
+                    renamed[image.path] = write_asset(image.path, f.read())
+                os.remove(image.path)
+            remove_variants(image.variants)
+            image.path = renamed[image.path]
+            image.variants = make_variants(image.path)
+            await image.save(update_fields=["path", "variants"])
+            typer.echo(f"{image.path}: {len(image.variants)} variants")
+
+    run_async(rename())
+
+
+DUPLICATE_SLUGS_SQL = """
+SELECT p.id, p.slug, left(p.slug, 90) || '-' || p.id AS new_slug FROM products p
+WHERE EXISTS (SELECT 1 FROM products o WHERE o.slug = p.slug AND o.id < p.id)
+ORDER BY p.id
+"""
+
+
+@app.command()
+def dedupe_product_slugs(apply: bool = False):
+    # The oldest product keeps a shared slug, later ones get their id appended.
+    # Their public URLs change, so this is a dry run unless --apply is given
+    from config import TORTOISE_ORM
+    from tortoise.transactions import in_transaction
+
+    async def dedupe():
+        await Tortoise.init(config=TORTOISE_ORM)
+        async with in_transaction() as conn:
+            rows = await conn.execute_query_dict(DUPLICATE_SLUGS_SQL)
+            for row in rows:
+                typer.echo(f"{row['id']}: {row['slug']} -> {row['new_slug']}")
+            if apply:
+                await conn.execute_query(
+                    "UPDATE products p SET slug = dupes.new_slug "
+                    f"FROM ({DUPLICATE_SLUGS_SQL}) dupes WHERE p.id = dupes.id"
+                )
+        if not rows:
+            typer.echo("No duplicate slugs")
+        elif apply:
+            typer.echo(f"Renamed {len(rows)} products")
+        else:
+            typer.echo(f"{len(rows)} products to rename, run with --apply")
+
+    run_async(dedupe())
+
+
+@app.command()
+def calibrate_bcrypt(budget_ms: int = 250, samples: int = 3):
+    # Highest bcrypt cost whose hash time on this host fits the latency budget
+    from passlib.hash import bcrypt
+
+    chosen = None
+    for rounds in range(4, 18):
+        hasher = bcrypt.using(rounds=rounds)
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            hasher.hash("calibration-password")
+            timings.append((time.perf_counter() - start) * 1000)
+        elapsed = min(timings)
+        typer.echo(f"rounds={rounds}: {elapsed:.1f}ms")
+        if elapsed > budget_ms:
+            break
+        chosen = rounds
+    if chosen is None:
+        typer.echo(f"No cost fits in {budget_ms}ms on this host")
+        raise typer.Exit(code=1)
+    if chosen < 10:
+        typer.echo("Warning: fewer than 10 rounds is too weak for production")
+    typer.echo(f"Set BCRYPT_ROUNDS={chosen} in .env")
+
+
 if __name__ == "__main__":
     app()
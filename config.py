@@ -11,10 +11,48 @@ POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="account/login", scheme_name="JWT")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Tune with `python commands.py calibrate-bcrypt`, hashes with other rounds are
+# rewritten on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
 ACCESS_TOKEN_EXPIRE_MINUTES = 7 * 24 * 60  # 7 Days
 BASELINK = ""
 TAXRATE = 5
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 60))  # Seconds
+# database: token column on the user table, memory: single worker, redis: shared
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "database")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# How cache invalidations reach the other workers, same choices as SESSION_BACKEND
+INVALIDATION_BACKEND = os.getenv("INVALIDATION_BACKEND", SESSION_BACKEND)
+# Trust signed token claims on read-only routes, revocations reach other workers
+# after at most REVOCATION_SYNC_INTERVAL seconds
+STATELESS_AUTH = os.getenv("STATELESS_AUTH") == "true"
+REVOCATION_SYNC_INTERVAL = int(os.getenv("REVOCATION_SYNC_INTERVAL", 30))  # Seconds
+# Token buckets checked before any login hashing, memory or redis
+LOGIN_THROTTLE_BACKEND = os.getenv("LOGIN_THROTTLE_BACKEND", "memory")
+LOGIN_USER_BURST = int(os.getenv("LOGIN_USER_BURST", 5))
+LOGIN_USER_PER_MINUTE = int(os.getenv("LOGIN_USER_PER_MINUTE", 10))
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", 20))
+LOGIN_IP_PER_MINUTE = int(os.getenv("LOGIN_IP_PER_MINUTE", 60))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 1000))
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", 60))  # Seconds
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", 500))
+PRODUCT_CACHE_TTL = int(os.getenv("PRODUCT_CACHE_TTL", 300))  # Seconds
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+IMAGE_VARIANT_WIDTHS = [
+    int(width) for width in os.getenv("IMAGE_VARIANT_WIDTHS", "200,400,800").split(",")
+]
+PRODUCT_BATCH_LIMIT = int(os.getenv("PRODUCT_BATCH_LIMIT", 50))
+CART_CACHE_SIZE = int(os.getenv("CART_CACHE_SIZE", 1000))
+CART_CACHE_TTL = int(os.getenv("CART_CACHE_TTL", 300))  # Seconds
+WISHLIST_CACHE_SIZE = int(os.getenv("WISHLIST_CACHE_SIZE", 1000))
+WISHLIST_CACHE_TTL = int(os.getenv("WISHLIST_CACHE_TTL", 60))  # Seconds
+CART_BATCH_LIMIT = int(os.getenv("CART_BATCH_LIMIT", 50))
+PRODUCT_INDEX_REFRESH = int(os.getenv("PRODUCT_INDEX_REFRESH", 300))  # Seconds
 
 DEV = os.getenv("DEV") == "true"
 
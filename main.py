@@ -1,9 +1,22 @@
 import os
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from tortoise.contrib.fastapi import RegisterTortoise
-from config import TORTOISE_ORM
+from config import (
+    TORTOISE_ORM,
+    STATELESS_AUTH,
+    REVOCATION_SYNC_INTERVAL,
+    PRODUCT_INDEX_REFRESH,
+)
+from utils import (
+    password_pool,
+    image_pool,
+    invalidation_bus,
+    session_store,
+    revocation_list,
+    product_index,
+    AssetFiles,
+)
 from typing import AsyncGenerator
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -22,6 +35,10 @@ DEV = os.getenv("DEV") == "true"
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # app startup
+    password_pool.start()
+    image_pool.start()
+    await invalidation_bus.start()
+    await session_store.start()
     async with RegisterTortoise(
         app,
         config=TORTOISE_ORM,
@@ -29,9 +46,18 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         add_exception_handlers=True,
     ):
         # db connected
+        await product_index.start(PRODUCT_INDEX_REFRESH)
+        if STATELESS_AUTH:
+            await revocation_list.start(REVOCATION_SYNC_INTERVAL)
         yield
         # app teardown
+        await revocation_list.close()
+        await product_index.close()
     # db connections closed
+    await session_store.close()
+    await invalidation_bus.close()
+    image_pool.shutdown()
+    password_pool.shutdown()
 
 
 app = FastAPI(title="Tortoise ORM FastAPI example", lifespan=lifespan)
@@ -57,7 +83,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", AssetFiles(directory="static"), name="static")
 
 app.include_router(account_routes.router, prefix="/account", tags=["Account"])
 app.include_router(admin_route.router, prefix="/admin", tags=["Admin"])
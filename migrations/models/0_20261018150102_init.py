@@ -0,0 +1,141 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "aerich" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "version" VARCHAR(255) NOT NULL,
+    "app" VARCHAR(100) NOT NULL,
+    "content" JSONB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS "customer" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "username" VARCHAR(20) NOT NULL UNIQUE,
+    "email" VARCHAR(50) NOT NULL UNIQUE,
+    "full_name" VARCHAR(50) NOT NULL,
+    "phone_no" VARCHAR(10) NOT NULL,
+    "is_disabled" BOOL NOT NULL  DEFAULT False,
+    "password_hash" VARCHAR(150) NOT NULL,
+    "token" VARCHAR(200),
+    "registered_on" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "last_login" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "delivery_address" INT
+);
+CREATE TABLE IF NOT EXISTS "address" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(50) NOT NULL,
+    "phone_no" VARCHAR(10) NOT NULL,
+    "address" VARCHAR(100) NOT NULL,
+    "city" VARCHAR(20) NOT NULL,
+    "state" VARCHAR(20) NOT NULL,
+    "pinCode" VARCHAR(10) NOT NULL,
+    "customer_id" INT NOT NULL REFERENCES "customer" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "employee" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "username" VARCHAR(20) NOT NULL UNIQUE,
+    "email" VARCHAR(50) NOT NULL UNIQUE,
+    "full_name" VARCHAR(50) NOT NULL,
+    "phone_no" VARCHAR(10) NOT NULL,
+    "is_disabled" BOOL NOT NULL  DEFAULT False,
+    "password_hash" VARCHAR(150) NOT NULL,
+    "token" VARCHAR(200),
+    "registered_on" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "last_login" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "is_superuser" BOOL NOT NULL  DEFAULT False,
+    "is_admin" BOOL NOT NULL  DEFAULT False,
+    "is_staff" BOOL NOT NULL  DEFAULT False
+);
+CREATE TABLE IF NOT EXISTS "orders" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "order_number" VARCHAR(10) NOT NULL UNIQUE,
+    "delivery_address" JSONB NOT NULL,
+    "order_placed_on" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "status" VARCHAR(20) NOT NULL,
+    "customer_id" INT NOT NULL REFERENCES "customer" ("id") ON DELETE CASCADE
+);
+COMMENT ON COLUMN "orders"."status" IS 'PACKING: Packing\nSHIPPED: Shipped\nDELIVERED: Delivered';
+CREATE TABLE IF NOT EXISTS "payment_details" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "card_number" VARCHAR(16) NOT NULL,
+    "card_holder_name" VARCHAR(50) NOT NULL,
+    "month" VARCHAR(2) NOT NULL,
+    "year" VARCHAR(4) NOT NULL,
+    "cvv" VARCHAR(3) NOT NULL,
+    "billing_address" JSONB NOT NULL,
+    "order_id" INT NOT NULL UNIQUE REFERENCES "orders" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "products" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(50) NOT NULL,
+    "slug" VARCHAR(100) NOT NULL,
+    "price" INT NOT NULL,
+    "description" TEXT NOT NULL,
+    "type" VARCHAR(20) NOT NULL
+);
+COMMENT ON COLUMN "products"."type" IS 'SHIRTS: Shirts\nTSHIRTS: TShirts\nPANTS: Pants\nJOGGERS: Joggers';
+CREATE TABLE IF NOT EXISTS "images" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "path" VARCHAR(100) NOT NULL,
+    "product_id" INT NOT NULL REFERENCES "products" ("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "idx_images_path_48926e" ON "images" ("path");
+CREATE TABLE IF NOT EXISTS "resource" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(50) NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS "role" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(50) NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS "permissions" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "read" BOOL NOT NULL  DEFAULT False,
+    "write" BOOL NOT NULL  DEFAULT False,
+    "update" BOOL NOT NULL  DEFAULT False,
+    "delete" BOOL NOT NULL  DEFAULT False,
+    "resource_id" INT NOT NULL REFERENCES "resource" ("id") ON DELETE CASCADE,
+    "role_id" INT NOT NULL REFERENCES "role" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_permissions_role_id_c2cdba" UNIQUE ("role_id", "resource_id")
+);
+CREATE TABLE IF NOT EXISTS "sizes" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "size" VARCHAR(5) NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS "cart" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "qty" INT NOT NULL,
+    "customer_id" INT NOT NULL REFERENCES "customer" ("id") ON DELETE CASCADE,
+    "product_id" INT NOT NULL REFERENCES "products" ("id") ON DELETE CASCADE,
+    "size_id" INT NOT NULL REFERENCES "sizes" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "inventory" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "quantity" INT NOT NULL,
+    "product_id" INT NOT NULL REFERENCES "products" ("id") ON DELETE CASCADE,
+    "size_id" INT NOT NULL REFERENCES "sizes" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "order_item" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "qty" INT NOT NULL,
+    "price" INT NOT NULL,
+    "product_id" INT NOT NULL REFERENCES "products" ("id") ON DELETE CASCADE,
+    "size_id" INT NOT NULL REFERENCES "sizes" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "wishlist" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "customer_id" INT NOT NULL REFERENCES "customer" ("id") ON DELETE CASCADE,
+    "product_id" INT NOT NULL REFERENCES "products" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_wishlist_product_1d537a" UNIQUE ("product_id", "customer_id")
+);
+CREATE TABLE IF NOT EXISTS "orders_order_item" (
+    "orders_id" INT NOT NULL REFERENCES "orders" ("id") ON DELETE CASCADE,
+    "orderitem_id" INT NOT NULL REFERENCES "order_item" ("id") ON DELETE CASCADE
+);
+CREATE UNIQUE INDEX IF NOT EXISTS "uidx_orders_orde_orders__633395" ON "orders_order_item" ("orders_id", "orderitem_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        """
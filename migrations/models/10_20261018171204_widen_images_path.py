@@ -0,0 +1,12 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # Stored names carry a content hash suffix now
+    return """
+        ALTER TABLE "images" ALTER COLUMN "path" TYPE VARCHAR(255);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "images" ALTER COLUMN "path" TYPE VARCHAR(100);"""
@@ -0,0 +1,23 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "customer" ALTER COLUMN "token" TYPE VARCHAR(500);
+        ALTER TABLE "employee" ALTER COLUMN "token" TYPE VARCHAR(500);
+        CREATE TABLE IF NOT EXISTS "revoked_token" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "jti" VARCHAR(32)  UNIQUE,
+    "user_table" VARCHAR(20),
+    "user_id" INT,
+    "revoked_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "expires_at" TIMESTAMPTZ NOT NULL
+);
+        CREATE INDEX IF NOT EXISTS "idx_revoked_tok_revoked_f4208b" ON "revoked_token" ("revoked_at");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "revoked_token";
+        ALTER TABLE "employee" ALTER COLUMN "token" TYPE VARCHAR(200);
+        ALTER TABLE "customer" ALTER COLUMN "token" TYPE VARCHAR(200);"""
@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "products" ADD COLUMN IF NOT EXISTS "search_vector" tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(name, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED;
+        CREATE INDEX IF NOT EXISTS "products_search_vector_idx" ON "products" USING GIN ("search_vector");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "products_search_vector_idx";
+        ALTER TABLE "products" DROP COLUMN IF EXISTS "search_vector";"""
@@ -0,0 +1,13 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE INDEX IF NOT EXISTS "products_type_price_idx" ON "products" ("type", "price", "id");
+        CREATE INDEX IF NOT EXISTS "inventory_product_size_qty_idx" ON "inventory" ("product_id", "size_id", "quantity");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "inventory_product_size_qty_idx";
+        DROP INDEX IF EXISTS "products_type_price_idx";"""
@@ -0,0 +1,27 @@
+from tortoise import BaseDBAsyncClient
+
+DUPLICATE_SLUGS_SQL = """
+SELECT slug, array_agg(id ORDER BY id) AS ids FROM products
+GROUP BY slug HAVING COUNT(*) > 1
+ORDER BY slug
+"""
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # Renaming changes public product URLs, so it is never done here
+    duplicates = await db.execute_query_dict(DUPLICATE_SLUGS_SQL)
+    if duplicates:
+        listed = ", ".join(f"{row['slug']} {row['ids']}" for row in duplicates[:20])
+        raise RuntimeError(
+            f"{len(duplicates)} product slugs are shared by several products: "
+            f"{listed}. Review them with `python commands.py dedupe-product-slugs`, "
+            "rename them with `--apply` and upgrade again."
+        )
+    return """
+        CREATE UNIQUE INDEX IF NOT EXISTS "products_slug_key" ON "products" ("slug");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "products" DROP CONSTRAINT IF EXISTS "products_slug_key";
+        DROP INDEX IF EXISTS "products_slug_key";"""
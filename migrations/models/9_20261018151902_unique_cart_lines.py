@@ -0,0 +1,27 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # Duplicate lines left by the old read-then-write add are merged into the
+    # oldest one. The lock keeps running workers from adding new duplicates
+    # before the index exists
+    return """
+        LOCK TABLE "cart" IN SHARE ROW EXCLUSIVE MODE;
+        UPDATE "cart" c SET "qty" = LEAST(dupes.qty, 10)
+        FROM (
+            SELECT MIN("id") AS id, SUM("qty") AS qty FROM "cart"
+            GROUP BY "customer_id", "product_id", "size_id" HAVING COUNT(*) > 1
+        ) dupes
+        WHERE c."id" = dupes.id;
+        DELETE FROM "cart" c USING "cart" older
+        WHERE older."customer_id" = c."customer_id"
+          AND older."product_id" = c."product_id"
+          AND older."size_id" = c."size_id"
+          AND older."id" < c."id";
+        CREATE UNIQUE INDEX IF NOT EXISTS "uid_cart_custome_71f28b" ON "cart" ("customer_id", "product_id", "size_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "cart" DROP CONSTRAINT IF EXISTS "uid_cart_custome_71f28b";
+        DROP INDEX IF EXISTS "uid_cart_custome_71f28b";"""
@@ -1,9 +1,10 @@
-from .user_models import Customer, Address, Employee
+from .user_models import Customer, Address, Employee, RevokedToken
 from .rbac_models import Role, Resource, Permissions
 from .product_models import (
     Products,
     Images,
     Cart,
+    CartState,
     Sizes,
     Wishlist,
     Inventory,
@@ -17,9 +18,11 @@ __all__ = [
     Customer,
     Address,
     Employee,
+    RevokedToken,
     Products,
     Images,
     Cart,
+    CartState,
     Sizes,
     Wishlist,
     Inventory,
@@ -9,7 +9,7 @@ class UserAbstractModel(models.Model):
     phone_no = fields.CharField(max_length=10, null=False)
     is_disabled = fields.BooleanField(default=False, null=False)
     password_hash = fields.CharField(max_length=150, null=False)
-    token = fields.CharField(max_length=200, null=True)
+    token = fields.CharField(max_length=500, null=True)
     registered_on = fields.DatetimeField(auto_now_add=True)
     last_login = fields.DatetimeField(auto_now=True)
 
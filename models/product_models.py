@@ -6,7 +6,7 @@ from .validators import validate_json_address
 class Products(models.Model):
     id = fields.IntField(primary_key=True)
     name = fields.CharField(max_length=50, null=False)
-    slug = fields.CharField(max_length=100, null=False)
+    slug = fields.CharField(max_length=100, unique=True, null=False)
     price = fields.IntField(null=False)
     description = fields.TextField()
     type = fields.CharEnumField(ProductType, max_length=20)
@@ -30,7 +30,9 @@ class Products(models.Model):
 
 class Images(models.Model):
     id = fields.IntField(primary_key=True)
-    path = fields.CharField(max_length=100, db_index=True, null=False)
+    path = fields.CharField(max_length=255, db_index=True, null=False)
+    # Resized WebP copies keyed by width, null until generated
+    variants = fields.JSONField(null=True)
 
     product = fields.ForeignKeyField("models.Products", related_name="images")
 
@@ -58,6 +60,20 @@ class Cart(models.Model):
 
     class Meta:
         table = "cart"
+        unique_together = ("customer", "product", "size")
+
+
+class CartState(models.Model):
+    # Bumped on every cart write so clients can tell if a delta applies to their copy
+    id = fields.IntField(primary_key=True)
+    version = fields.BigIntField(default=0, null=False)
+
+    customer = fields.OneToOneField(
+        "models.Customer", related_name="cart_state", null=False
+    )
+
+    class Meta:
+        table = "cart_state"
 
 
 class Sizes(models.Model):
@@ -38,3 +38,16 @@ class Address(models.Model):
 
     class Meta:
         table = "address"
+
+
+class RevokedToken(models.Model):
+    id = fields.IntField(primary_key=True)
+    # Either a single token (jti) or every token of a user issued before revoked_at
+    jti = fields.CharField(max_length=32, unique=True, null=True)
+    user_table = fields.CharField(max_length=20, null=True)
+    user_id = fields.IntField(null=True)
+    revoked_at = fields.DatetimeField(auto_now_add=True, db_index=True)
+    expires_at = fields.DatetimeField(null=False)
+
+    class Meta:
+        table = "revoked_token"
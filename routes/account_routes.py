@@ -1,35 +1,59 @@
 import tortoise
+from jose import jwt
 from typing import Annotated
 from fastapi import Depends, APIRouter, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from tortoise.transactions import in_transaction
-from utils import get_password_hash, create_access_token, verify_password, get_customer
+from utils import (
+    get_password_hash_async,
+    create_access_token,
+    verify_and_update_password_async,
+    get_customer,
+    session_store,
+    revocation_list,
+    login_throttle,
+)
 from models import Customer, Address
-from schema import CustomerSignUp, TokenOut, CustomerSchema
+from schema import CustomerSignUp, TokenOut, TokenPrincipal
+from config import oauth2_scheme
 
 router = APIRouter()
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(login_throttle("account"))])
 async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
 ):
     customer = await Customer.get_or_none(username=form_data.username)
     if not customer:
         raise HTTPException(status_code=401)
-    if not verify_password(form_data.password, customer.password_hash):
+    valid, new_hash = await verify_and_update_password_async(
+        form_data.password, customer.password_hash
+    )
+    if not valid:
         raise HTTPException(status_code=401)
-    token = create_access_token(data={"username": customer.username})
+    if new_hash:
+        customer.password_hash = new_hash
+    token = create_access_token(
+        data={
+            "username": customer.username,
+            "user_id": customer.id,
+            "disabled": customer.is_disabled,
+        }
+    )
+    previous_token = customer.token
     customer.token = token
-    await customer.save()
+    await customer.save(update_fields=["token", "password_hash", "last_login"])
+    await session_store.add(customer, token)
+    await revocation_list.revoke_replaced_token(previous_token)
     return TokenOut(access_token=customer.token, token_type="bearer")
 
 
 @router.post("/signup")
 async def signup_user(customer: CustomerSignUp):
     try:
+        password_hash = await get_password_hash_async(customer.password)
         async with in_transaction() as conn:
-            password_hash = get_password_hash(customer.password)
             new_customer = await Customer.create(
                 username=customer.username,
                 password_hash=password_hash,
@@ -48,12 +72,19 @@ async def signup_user(customer: CustomerSignUp):
                 phone_no=customer.phone_no,
             )
             await new_address.save(using_db=conn)
-        token = create_access_token(data={"username": new_customer.username})
+        token = create_access_token(
+            data={
+                "username": new_customer.username,
+                "user_id": new_customer.id,
+                "disabled": new_customer.is_disabled,
+            }
+        )
         new_customer = await Customer.get(email=customer.email)
         new_address = await Address.get(customer_id=new_customer.id)
         new_customer.delivery_address = new_address.id
         new_customer.token = token
-        await new_customer.save()
+        await new_customer.save(update_fields=["delivery_address", "token"])
+        await session_store.add(new_customer, token)
         new_customer.token = token
         return TokenOut(access_token=new_customer.token, token_type="bearer")
     except tortoise.exceptions.IntegrityError:
@@ -63,7 +94,13 @@ async def signup_user(customer: CustomerSignUp):
 
 
 @router.post("/logout")
-async def logout(current_user: Annotated[CustomerSchema, Depends(get_customer)]):
-    current_user.token = ""
-    await current_user.save()
+async def logout(
+    current_user: Annotated[TokenPrincipal, Depends(get_customer)],
+    token: Annotated[str, Depends(oauth2_scheme)],
+):
+    customer = await Customer.get(id=current_user.id)
+    customer.token = ""
+    await customer.save(update_fields=["token"])
+    await session_store.revoke(customer, token)
+    await revocation_list.revoke_token(jwt.get_unverified_claims(token))
     return {"message": "Successfully logged out"}
@@ -1,10 +1,29 @@
 from typing import Annotated, Literal
-from fastapi import Depends, HTTPException, APIRouter
+from fastapi import Depends, HTTPException, APIRouter, Request, Query
 from Enum.enum_definations import OrderStatus
-from config import SIZE_IDS, BASELINK, TAXRATE
-from utils import get_customer, get_cart_summary_response
+from config import SIZE_IDS, TAXRATE, CART_BATCH_LIMIT, PRODUCT_BATCH_LIMIT
+from utils import (
+    get_customer,
+    get_customer_claims,
+    get_cart_summary_response,
+    cached_cart_summary_response,
+    get_cart_delta_response,
+    bump_cart_version,
+    apply_cart_operations,
+    add_product_to_cart,
+    move_wishlist_item_to_cart,
+    move_wishlist_items_to_cart,
+    change_cart_item_size,
+    get_wishlist_ids,
+    get_wishlist_membership,
+    fetch_wishlist_page,
+    WISHLIST_PAGE_SIZE,
+    invalidate_wishlist,
+    asset_url,
+)
 from tortoise.transactions import in_transaction
 from models import (
+    Customer,
     Products,
     Wishlist,
     Cart,
@@ -16,14 +35,16 @@ from models import (
 )
 from schema import (
     AddToWishlistOut,
-    CustomerSchema,
+    TokenPrincipal,
     AddToCartOut,
     IsInWishlistOut,
     RemoveWishlistItemOut,
     MoveToCartIn,
     MoveToCartOut,
+    MoveItemsToCartIn,
     UpdateCartItemQtyIn,
     UpdateCartItemSizeIn,
+    CartBatchIn,
     NewAddressUserAddressIn,
     PaymentDetailsIn,
     OrderItemsOut,
@@ -36,14 +57,15 @@ router = APIRouter()
 @router.post("/add-to-wishlist", response_model=AddToWishlistOut)
 async def add_to_wishlist(
     item_slug,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
 ):
     try:
         product_id = await Products.get_or_none(slug=item_slug)
         if product_id is None:
             raise HTTPException(status_code=404, detail="Product not found.")
-        wishlist_item = Wishlist(product=product_id, customer=customer)
+        wishlist_item = Wishlist(product=product_id, customer_id=customer.id)
         await wishlist_item.save()
+        await invalidate_wishlist(customer.id)
         return {"success": "Product added to wishlist"}
     except HTTPException:
         raise
@@ -54,31 +76,14 @@ async def add_to_cart(
     item_slug: str,
     size: Literal["s", "m", "l", "xl", "xxl", "32", "34", "36", "38", "40"],
     qty: int,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
 ):
     try:
         if qty > 10:
             raise HTTPException(status_code=400, detail="Cannot add more than 10 items")
-        product = await Products.get_or_none(slug=item_slug)
-        if product is None:
-            raise HTTPException(status_code=404, detail="Product not found")
-        old_item_in_cart = await Cart.get_or_none(
-            product_id=product.id, customer_id=customer.id, size_id=SIZE_IDS[size]
-        )
-        # if user already have item in cart
-        if old_item_in_cart:
-            if old_item_in_cart.qty + qty <= 10:
-                old_item_in_cart.qty += qty
-                await old_item_in_cart.save()
-        # if user added item in the cart for the first time
-        else:
-            cart_item = Cart(
-                product_id=product.id,
-                customer_id=customer.id,
-                size_id=SIZE_IDS[size],
-                qty=qty,
-            )
-            await cart_item.save()
+        async with in_transaction() as conn:
+            await add_product_to_cart(conn, customer.id, item_slug, size, qty)
+            await bump_cart_version(customer.id, conn)
         return {"success": "Product added to cart"}
     except HTTPException:
         raise
@@ -87,53 +92,54 @@ async def add_to_cart(
 @router.get("/is-in-wishlist", response_model=IsInWishlistOut)
 async def is_in_wishlist(
     slug: str,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer_claims)],
 ):
     try:
         product = await Products.get_or_none(slug=slug)
         if product is None:
             raise HTTPException(status_code=404, detail="Item not found in wishlist")
-        wishlist_item = await Wishlist.get_or_none(
-            product_id=product.id, customer_id=customer.id
-        )
-        if wishlist_item:
+        if product.id in await get_wishlist_ids(customer.id):
             return {"success": "Item in wishlist"}
         raise HTTPException(status_code=404)
     except HTTPException:
         raise
 
 
+@router.get("/wishlist-membership")
+async def wishlist_membership(
+    customer: Annotated[TokenPrincipal, Depends(get_customer_claims)],
+    slug: Annotated[list[str], Query()],
+):
+    try:
+        if len(slug) > PRODUCT_BATCH_LIMIT:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot check more than {PRODUCT_BATCH_LIMIT} products at once",
+            )
+        return await get_wishlist_membership(customer.id, slug)
+    except HTTPException:
+        raise
+
+
 # TODO: Add response_model
 @router.get("/get-wishlist", status_code=200)
 async def get_wishlist(
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer_claims)],
+    per_page: int | None = None,
+    cursor: int | None = None,
 ):
     try:
-        wishlist_items = await Wishlist.filter(
-            customer_id=customer.id
-        ).prefetch_related(
-            "product__images",
-            "product__inventory__size",
-            "customer",
-        )
-        if not wishlist_items:
-            raise HTTPException(status_code=404)
-        response = []
-        for item in wishlist_items:
-            response.append(
-                {
-                    "name": item.product.name,
-                    "slug": item.product.slug,
-                    "price": item.product.price,
-                    "image": BASELINK + item.product.images[0].path,
-                    "type": item.product.type,
-                    "sizeAvailable": {
-                        i.size.size: True if i.quantity > 0 else False
-                        for i in item.product.inventory
-                    },
-                }
+        # Clients that do not page get the whole wishlist
+        if per_page is None and cursor is not None:
+            per_page = WISHLIST_PAGE_SIZE
+        if per_page is not None and (per_page < 1 or per_page > 100):
+            raise HTTPException(
+                status_code=400, detail="Item count must be between 1 and 100"
             )
-        return {"wishlist": response}
+        response = await fetch_wishlist_page(customer.id, per_page, cursor)
+        if not response["wishlist"] and cursor is None:
+            raise HTTPException(status_code=404)
+        return response
     except HTTPException:
         raise
 
@@ -141,7 +147,7 @@ async def get_wishlist(
 @router.post("/remove-wishlist-item", response_model=RemoveWishlistItemOut)
 async def remove_wishlist_item(
     slug: str,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
 ):
     try:
         product_id = await Products.get_or_none(slug=slug)
@@ -152,6 +158,7 @@ async def remove_wishlist_item(
         )
         if wishlist_item:
             await wishlist_item.delete()
+            await invalidate_wishlist(customer.id)
             return {
                 "success": "Item removed from wishlist successfully",
             }
@@ -161,42 +168,18 @@ async def remove_wishlist_item(
         raise
 
 
-# TODO: make this a transaction
 @router.post("/move-to-cart", response_model=MoveToCartOut)
 async def move_to_cart(
     request: MoveToCartIn,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
 ):
     try:
-        size_id = SIZE_IDS[request.size]
-        product = await Products.get_or_none(slug=request.slug)
-        if product is None:
-            raise HTTPException(status_code=404)
-        wishlist_item = await Wishlist.get_or_none(
-            product_id=product.id, customer_id=customer.id
-        )
-        if wishlist_item is None:
-            raise HTTPException(status_code=400, detail="Item not in user wishlist.")
-        old_item_in_cart = await Cart.get_or_none(
-            product_id=product.id,
-            customer_id=customer.id,
-            size_id=size_id,
-        )
-        # if user already have item in cart
-        if old_item_in_cart:
-            if old_item_in_cart.qty + request.qty <= 10:
-                old_item_in_cart.qty += request.qty
-                await old_item_in_cart.save()
-        # if user added item in the cart for the first time
-        else:
-            cart_item = await Cart(
-                product_id=product.id,
-                customer_id=customer.id,
-                size_id=size_id,
-                qty=request.qty,
+        async with in_transaction() as conn:
+            await move_wishlist_item_to_cart(
+                conn, customer.id, request.slug, request.size, request.qty
             )
-            await cart_item.save()
-        await wishlist_item.delete()
+            await bump_cart_version(customer.id, conn)
+        await invalidate_wishlist(customer.id)
         return {
             "success": "Item moved to cart",
         }
@@ -204,13 +187,35 @@ async def move_to_cart(
         raise
 
 
+@router.post("/move-items-to-cart")
+async def move_items_to_cart(
+    request: MoveItemsToCartIn,
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
+):
+    try:
+        if not request.items:
+            raise HTTPException(status_code=400, detail="No items given.")
+        if len(request.items) > CART_BATCH_LIMIT:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot move more than {CART_BATCH_LIMIT} items at once.",
+            )
+        async with in_transaction() as conn:
+            await move_wishlist_items_to_cart(conn, customer.id, request.items)
+        await invalidate_wishlist(customer.id)
+        return await get_cart_summary_response(customer)
+    except HTTPException:
+        raise
+
+
 # TODO: Add response_model
 @router.get("/get-cart-summary")
 async def get_cart_summary(
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    request: Request,
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
 ):
     try:
-        return await get_cart_summary_response(customer)
+        return await cached_cart_summary_response(request, customer)
     except HTTPException:
         raise
 
@@ -219,7 +224,8 @@ async def get_cart_summary(
 @router.post("/update-cart-item-qty")
 async def update_cart_item_qty(
     item: UpdateCartItemQtyIn,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
+    delta: bool = False,
 ):
     try:
         if item.qty > 10:
@@ -233,8 +239,12 @@ async def update_cart_item_qty(
         if cart_item is None:
             raise HTTPException(status_code=404)
         cart_item.qty = item.qty
-        await cart_item.save()
+        async with in_transaction() as conn:
+            await cart_item.save(using_db=conn)
+            await bump_cart_version(customer.id, conn)
 
+        if delta:
+            return await get_cart_delta_response(customer, [(item.id, size_id)])
         return await get_cart_summary_response(customer)
     except HTTPException:
         raise
@@ -244,31 +254,22 @@ async def update_cart_item_qty(
 @router.post("/update-item-size")
 async def update_item_qty(
     item: UpdateCartItemSizeIn,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
+    delta: bool = False,
 ):
     try:
         size_id = SIZE_IDS[item.size]
         prev_size_id = SIZE_IDS[item.prevSize]
-        prev_cart_item = await Cart.get_or_none(
-            customer_id=customer.id, product_id=item.id, size_id=size_id
-        )
-        cart_item = await Cart.get_or_none(
-            customer_id=customer.id,
-            product_id=item.id,
-            size_id=prev_size_id,
-            qty=item.qty,
-        )
-        if prev_cart_item:
-            if prev_cart_item.qty + item.qty > 10:
-                prev_cart_item.qty = 10
-            else:
-                prev_cart_item.qty += item.qty
-            await cart_item.delete()
-            await prev_cart_item.save()
-        else:
-            cart_item.size_id = size_id
-            await cart_item.save()
+        async with in_transaction() as conn:
+            await change_cart_item_size(
+                conn, customer.id, item.id, item.prevSize, item.size
+            )
+            await bump_cart_version(customer.id, conn)
 
+        if delta:
+            return await get_cart_delta_response(
+                customer, [(item.id, prev_size_id), (item.id, size_id)]
+            )
         return await get_cart_summary_response(customer)
     except HTTPException:
         raise
@@ -280,7 +281,8 @@ async def remove_cart_item(
     item_id,
     qty,
     size,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
+    delta: bool = False,
 ):
     size_id = SIZE_IDS[size]
     try:
@@ -291,22 +293,51 @@ async def remove_cart_item(
             qty=qty,
         )
         if cart_item:
-            await cart_item.delete()
+            async with in_transaction() as conn:
+                await cart_item.delete(using_db=conn)
+                await bump_cart_version(customer.id, conn)
+            if delta:
+                return await get_cart_delta_response(
+                    customer, [(cart_item.product_id, size_id)]
+                )
             return await get_cart_summary_response(customer)
         raise HTTPException(status_code=404, detail="Item not found in cart.")
     except HTTPException:
         raise
 
 
+@router.post("/cart/batch")
+async def cart_batch(
+    batch: CartBatchIn,
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
+):
+    try:
+        if not batch.ops:
+            raise HTTPException(status_code=400, detail="No cart operations given.")
+        if len(batch.ops) > CART_BATCH_LIMIT:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot apply more than {CART_BATCH_LIMIT} operations at once.",
+            )
+        async with in_transaction() as conn:
+            await apply_cart_operations(customer.id, batch.ops, conn)
+        # Move operations take items off the wishlist
+        await invalidate_wishlist(customer.id)
+        return await get_cart_summary_response(customer)
+    except HTTPException:
+        raise
+
+
 # TODO: Add response_model
 @router.post("/add-new-user-address")
 async def get_user_addresses(
     address: NewAddressUserAddressIn,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
 ):
     try:
         addresses = await Address.filter(customer_id=customer.id)
         if len(addresses) < 3:
+            profile = await Customer.get(id=customer.id)
             new_address = Address(
                 name=address.name,
                 address=address.address,
@@ -314,9 +345,12 @@ async def get_user_addresses(
                 state=address.state,
                 pinCode=address.pinCode,
                 customer_id=customer.id,
-                phone_no=customer.phone_no,
+                phone_no=profile.phone_no,
             )
-            await new_address.save()
+            async with in_transaction() as conn:
+                await new_address.save(using_db=conn)
+                # Addresses are part of the cart summary
+                await bump_cart_version(customer.id, conn)
             new_addresses = await Address.filter(customer_id=customer.id)
             return {"new_addresses": new_addresses}
         else:
@@ -329,13 +363,16 @@ async def get_user_addresses(
 @router.post("/update-delivery-address")
 async def update_delivery_address(
     addressId,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
 ):
     try:
         address = await Address.get_or_none(id=addressId)
         if address:
-            customer.delivery_address = addressId
-            await customer.save()
+            async with in_transaction() as conn:
+                profile = await Customer.get(id=customer.id).using_db(conn)
+                profile.delivery_address = addressId
+                await profile.save(using_db=conn, update_fields=["delivery_address"])
+                await bump_cart_version(customer.id, conn)
             return {"status": "success"}
         else:
             raise HTTPException(status_code=404, detail="Address not found")
@@ -346,11 +383,13 @@ async def update_delivery_address(
 @router.post("/place-order")
 async def place_order(
     payment_details: PaymentDetailsIn,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
 ):
     try:
         async with in_transaction() as conn:
-            address = await Address.get_or_none(id=customer.delivery_address)
+            # Read fresh, the delivery address may have just been changed
+            profile = await Customer.get(id=customer.id).using_db(conn)
+            address = await Address.get_or_none(id=profile.delivery_address)
             if address is None:
                 raise HTTPException(status_code=404, detail="Addres not found in db")
             cart_items_in_db = await Cart.filter(
@@ -373,7 +412,7 @@ async def place_order(
                     "state": address.state,
                     "pinCode": address.pinCode,
                 },
-                customer=customer,
+                customer_id=customer.id,
                 status=OrderStatus.PACKING,
             )
             await new_order.save(using_db=conn)
@@ -387,7 +426,7 @@ async def place_order(
                 order=new_order,
                 billing_address={
                     "name": address.name,
-                    "phoneNo": customer.phone_no,
+                    "phoneNo": profile.phone_no,
                     "address": address.address,
                     "city": address.city,
                     "state": address.state,
@@ -406,6 +445,7 @@ async def place_order(
                 await new_order_item.save(using_db=conn)
                 await new_order.OrderItem.add(new_order_item)
                 await item.delete(using_db=conn)
+            await bump_cart_version(customer.id, conn)
             return {"cart_item": "cart_items"}
 
     except HTTPException:
@@ -413,7 +453,7 @@ async def place_order(
 
 
 @router.get("/get-orders")
-async def get_orders(customer: Annotated[CustomerSchema, Depends(get_customer)]):
+async def get_orders(customer: Annotated[TokenPrincipal, Depends(get_customer_claims)]):
     try:
         orders = (
             await Orders.filter(customer_id=customer.id)
@@ -441,7 +481,7 @@ async def get_orders(customer: Annotated[CustomerSchema, Depends(get_customer)])
 )
 async def get_orders_details(
     order_number,
-    customer: Annotated[CustomerSchema, Depends(get_customer)],
+    customer: Annotated[TokenPrincipal, Depends(get_customer)],
 ):
     try:
         response = {"orderDetails": {}, "orderItems": []}
@@ -457,7 +497,7 @@ async def get_orders_details(
                 await OrderImageOut.from_tortoise_orm(item.product.images[0])
             ).model_dump()
             size = await Sizes.get_or_none(id=item.size_id)
-            product["image"] = BASELINK + image_dict["path"]
+            product["image"] = asset_url(image_dict["path"])
             product["size"] = size.size
             product["qty"] = item.qty
 
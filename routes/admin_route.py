@@ -1,18 +1,40 @@
+import asyncio
 import os
 import tortoise
 from typing import Annotated, List
 from slugify import slugify
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from fastapi.security import OAuth2PasswordRequestForm
-from config import BASELINK, SIZE_IDS, TAXRATE
+from config import SIZE_IDS, TAXRATE
 import tortoise.exceptions
 from tortoise.expressions import Q
 from tortoise.transactions import in_transaction
 from models.product_models import Orders, Sizes
-from utils import get_employee
+from utils import (
+    get_employee,
+    get_employee_claims,
+    customer_cache,
+    employee_cache,
+    employee_roles,
+    session_store,
+    revocation_list,
+    login_throttle,
+    login_throttle_stats,
+    catalog_cache,
+    bump_catalog_version,
+    invalidate_product,
+    product_cache,
+    cart_cache,
+    wishlist_cache,
+    product_index,
+    generate_variants,
+    remove_variants,
+    asset_url,
+    save_upload,
+)
 from models import Employee, Products, Images, Inventory
 from schema import (
-    EmployeeSchema,
+    TokenPrincipal,
     NewEmployeeSchema,
     AllEmployeeOut,
     ChangEmployeeStatusIn,
@@ -33,8 +55,8 @@ from schema import (
     OrderImageOut,
 )
 from utils import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_and_update_password_async,
     create_access_token,
 )
 from Enum.enum_definations import OrderStatus
@@ -83,32 +105,38 @@ router = APIRouter()
 #         raise HTTPException(status_code=500, detail="Something went wrong")
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(login_throttle("admin"))])
 async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
     try:
         employee = await Employee.get_or_none(username=form_data.username)
         if not employee:
             raise HTTPException(status_code=401)
-        if not verify_password(form_data.password, employee.password_hash):
+        valid, new_hash = await verify_and_update_password_async(
+            form_data.password, employee.password_hash
+        )
+        if not valid:
             raise HTTPException(status_code=401)
-        if any([employee.is_superuser, employee.is_admin, employee.is_staff]):
-            token = create_access_token(data={"username": employee.username})
-            employee.token = token
-            employee
-            employee_roles = []
-            if employee.is_superuser:
-                employee_roles.append("is_superuser")
-            if employee.is_admin:
-                employee_roles.append("is_admin")
-            if employee.is_staff:
-                employee_roles.append("is_staff")
-            token = create_access_token(data={"username": employee.username})
+        if new_hash:
+            employee.password_hash = new_hash
+        roles = employee_roles(employee)
+        if roles:
+            token = create_access_token(
+                data={
+                    "username": employee.username,
+                    "user_id": employee.id,
+                    "disabled": employee.is_disabled,
+                    "roles": roles,
+                }
+            )
+            previous_token = employee.token
             employee.token = token
-            await employee.save()
+            await employee.save(update_fields=["token", "password_hash", "last_login"])
+            await session_store.add(employee, token)
+            await revocation_list.revoke_replaced_token(previous_token)
             return {
                 "access_token": employee.token,
                 "token_type": "bearer",
-                "roles": employee_roles,
+                "roles": roles,
             }
         else:
             raise HTTPException(
@@ -123,7 +151,7 @@ async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
 @router.post("/add-new-employee")
 async def create_employee(
     new_employee_details: NewEmployeeSchema,
-    employee: Annotated[EmployeeSchema, Depends(get_employee)],
+    employee: Annotated[TokenPrincipal, Depends(get_employee)],
 ):
     try:
         old_employee = await Employee.filter(
@@ -138,7 +166,7 @@ async def create_employee(
                 raise HTTPException(status_code=400, detail="Username already exists")
             if emp.email == new_employee_details.email:
                 raise HTTPException(status_code=400, detail="Email already exists")
-        password_hash = get_password_hash(new_employee_details.password)
+        password_hash = await get_password_hash_async(new_employee_details.password)
         employee = Employee(
             username=new_employee_details.username.lower(),
             email=new_employee_details.email.lower(),
@@ -157,7 +185,7 @@ async def create_employee(
 
 @router.get("/all-employee", response_model=List[AllEmployeeOut])
 async def get_all_employee(
-    employee: Annotated[EmployeeSchema, Depends(get_employee)],
+    employee: Annotated[TokenPrincipal, Depends(get_employee_claims)],
 ):
     try:
         q = await Employee.all()
@@ -191,22 +219,39 @@ async def get_all_employee(
 @router.post("/change-employee-status", response_model=ChangEmployeeStatusOut)
 async def disable_employee(
     employee_data: ChangEmployeeStatusIn,
-    employee: Annotated[EmployeeSchema, Depends(get_employee)],
+    employee: Annotated[TokenPrincipal, Depends(get_employee)],
 ):
     emp = await Employee.get_or_none(id=employee_data.id)
     if emp is None:
         raise HTTPException(status_code=404, detail="Employee not found")
     emp.is_disabled = employee_data.status
-    await emp.save()
+    await emp.save(update_fields=["is_disabled"])
+    await session_store.invalidate_user(emp)
+    await revocation_list.revoke_user(emp._meta.db_table, emp.id)
     return {"detail": f"Employee status changed to {emp.is_disabled}"}
 
 
+@router.get("/metrics")
+async def get_metrics(employee: Annotated[TokenPrincipal, Depends(get_employee)]):
+    return {
+        "principalCache": {
+            "customer": customer_cache.stats(),
+            "employee": employee_cache.stats(),
+        },
+        "loginThrottle": login_throttle_stats(),
+        "catalogCache": catalog_cache.stats(),
+        "productCache": product_cache.stats(),
+        "cartCache": cart_cache.stats(),
+        "wishlistCache": wishlist_cache.stats(),
+    }
+
+
 @router.get("/get-all-products", response_model=GetAllProducts)
 async def get_all_products(
     page: int,
     per_page: int,
     name: str | None = None,
-    employee=Depends(get_employee),
+    employee=Depends(get_employee_claims),
 ):
     offset = (page - 1) * per_page
     products = await Products.all().offset(offset).limit(per_page)
@@ -220,6 +265,15 @@ async def get_all_products(
     return products
 
 
+@router.get("/autocomplete-products")
+async def autocomplete_products(
+    q: str,
+    employee: Annotated[TokenPrincipal, Depends(get_employee_claims)],
+    limit: int = 10,
+):
+    return product_index.search(q, min(max(limit, 1), 50))
+
+
 @router.post("/add-product", response_model=AddProductOut)
 async def add_new_product(
     product: AddProductIn,
@@ -232,14 +286,21 @@ async def add_new_product(
         price=product.price,
         type=product.type,
     )
-    await db_product.save()
+    try:
+        await db_product.save()
+    except tortoise.exceptions.IntegrityError:
+        raise HTTPException(
+            status_code=400, detail="A product with this name already exists"
+        )
+    await bump_catalog_version()
+    product_index.add(db_product.id, db_product.name, db_product.slug)
     return {"id": db_product.id}
 
 
 @router.post("/add-product-images/{product_id}", response_model=AddProductImages)
 async def add_product_images(
     product_id: int,
-    employee: Annotated[EmployeeSchema, Depends(get_employee)],
+    employee: Annotated[TokenPrincipal, Depends(get_employee)],
     files: List[UploadFile] = File(...),
 ):
     product_db = await Products.get_or_none(id=product_id)
@@ -248,22 +309,25 @@ async def add_product_images(
     images_entries = []
     for file in files:
         content = await file.read()
-        with open(f"static/public/{product_id}_{file.filename}", "wb") as f:
-            f.write(content)
-            images_entries.append(
-                Images(
-                    product_id=product_id,
-                    path=f"static/public/{product_id}_{file.filename}",
-                )
-            )
+        path = await save_upload(
+            f"static/public/{product_id}_{file.filename}", content
+        )
+        images_entries.append(Images(product_id=product_id, path=path))
+    # Resized in the image pool, all uploads of the request at once
+    variants = await asyncio.gather(
+        *(generate_variants(image.path) for image in images_entries)
+    )
+    for image, image_variants in zip(images_entries, variants):
+        image.variants = image_variants
     await Images.bulk_create(images_entries)
+    await invalidate_product(product_id)
     return {"message": "Images added"}
 
 
 @router.post("/update-topwear-inventory", response_model=UpdateTopWearInventoryOut)
 async def update_topwear_inventory(
     sizes: UpdateTopWearInventoryIn,
-    employee: Annotated[EmployeeSchema, Depends(get_employee)],
+    employee: Annotated[TokenPrincipal, Depends(get_employee)],
 ):
     # try:
     db_product = await Products.get_or_none(id=sizes.product_id)
@@ -293,7 +357,8 @@ async def update_topwear_inventory(
                 elif inv.size.size == "xxl":
                     inv.quantity = sizes.xxl
                     await inv.save(using_db=conn)
-            return {"message": "Inventory updated"}
+        await invalidate_product(sizes.product_id)
+        return {"message": "Inventory updated"}
     else:
         new_inventory_entries = [
             Inventory(
@@ -323,6 +388,7 @@ async def update_topwear_inventory(
             ),
         ]
         await Inventory.bulk_create(new_inventory_entries)
+        await invalidate_product(sizes.product_id)
         return {"message": "Inventory updated"}
     # except tortoise.exceptions.IntegrityError:
     #     raise HTTPException(status_code=400, detail="Account already exist")
@@ -337,7 +403,7 @@ async def update_topwear_inventory(
 )
 async def update_bottomwear_inventory(
     sizes: UpdateBottomwearInventoryIn,
-    employee: Annotated[EmployeeSchema, Depends(get_employee)],
+    employee: Annotated[TokenPrincipal, Depends(get_employee)],
 ):
     # try:
     db_product = await Products.get_or_none(id=sizes.product_id)
@@ -367,7 +433,8 @@ async def update_bottomwear_inventory(
                 elif inv.size.size == "40":
                     inv.quantity = sizes.size_40
                     await inv.save(using_db=conn)
-            return {"message": "Inventory updated"}
+        await invalidate_product(sizes.product_id)
+        return {"message": "Inventory updated"}
     else:
         new_inventory_entries = [
             Inventory(
@@ -397,6 +464,7 @@ async def update_bottomwear_inventory(
             ),
         ]
         await Inventory.bulk_create(new_inventory_entries)
+        await invalidate_product(sizes.product_id)
         return {"message": "Inventory updated"}
     # except tortoise.exceptions.IntegrityError:
     #     raise HTTPException(status_code=400, detail="Account already exist")
@@ -408,7 +476,7 @@ async def update_bottomwear_inventory(
 
 @router.get("/get-product-info")
 async def get_product_info(
-    id: int, employee: Annotated[EmployeeSchema, Depends(get_employee)]
+    id: int, employee: Annotated[TokenPrincipal, Depends(get_employee_claims)]
 ):
     try:
         product = await Products.get_or_none(id=id).prefetch_related("images")
@@ -417,7 +485,7 @@ async def get_product_info(
         response = dict(product)
         return_images = []
         for image in await product.images:
-            return_images.append({"id": image.id, "path": BASELINK + image.path})
+            return_images.append({"id": image.id, "path": asset_url(image.path)})
         response["images"] = return_images
         return response
     except HTTPException:
@@ -427,7 +495,7 @@ async def get_product_info(
 @router.post("/update-product-info")
 async def update_product_info(
     product_info: UpdateProductInfoIn,
-    employee: Annotated[EmployeeSchema, Depends(get_employee)],
+    employee: Annotated[TokenPrincipal, Depends(get_employee)],
 ):
     try:
         product = await Products.get_or_none(id=product_info.id)
@@ -438,6 +506,8 @@ async def update_product_info(
         product.type = product_info.type
         product.description = product_info.description
         await product.save()
+        await invalidate_product(product.id)
+        product_index.add(product.id, product.name, product.slug)
         return {"success": 200}
     except HTTPException:
         raise
@@ -446,7 +516,7 @@ async def update_product_info(
 @router.post("/delete-product-image")
 async def delete_product_image(
     product_image_detail: DeleteProductImage,
-    employee: Annotated[EmployeeSchema, Depends(get_employee)],
+    employee: Annotated[TokenPrincipal, Depends(get_employee)],
 ):
     try:
         product = await Products.get_or_none(
@@ -461,12 +531,16 @@ async def delete_product_image(
             )
         image = await Images.get_or_none(id=product_image_detail.imageId)
         if image:
-            if os.path.exists(image.path):
-                os.remove(image.path)
             await image.delete()
+            # Identical uploads share one hashed file, keep it while still used
+            if not await Images.filter(path=image.path).exists():
+                if os.path.exists(image.path):
+                    os.remove(image.path)
+                remove_variants(image.variants)
+            await invalidate_product(product.id)
             return_images = []
             for image in await product.images:
-                return_images.append({"id": image.id, "path": BASELINK + image.path})
+                return_images.append({"id": image.id, "path": asset_url(image.path)})
             return {"images": return_images}
         else:
             raise HTTPException(status_code=404, detail="Image not found.")
@@ -476,7 +550,7 @@ async def delete_product_image(
 
 @router.post("/add-product-image")
 async def add_product_image(
-    employee: Annotated[EmployeeSchema, Depends(get_employee)],
+    employee: Annotated[TokenPrincipal, Depends(get_employee)],
     product_id: int,
     image: UploadFile = File(...),
 ):
@@ -485,23 +559,25 @@ async def add_product_image(
         if product is None:
             raise HTTPException(status_code=404, detail="Cannot find product.")
         content = await image.read()
-        with open(f"static/public/{product_id}_{image.filename}", "wb") as f:
-            f.write(content)
-            img = Images(
-                product_id=product_id,
-                path=f"static/public/{product_id}_{image.filename}",
-            )
-            await img.save()
-            return_images = []
-            for image in await product.images:
-                return_images.append({"id": image.id, "path": BASELINK + image.path})
-            return return_images
+        path = await save_upload(
+            f"static/public/{product_id}_{image.filename}", content
+        )
+        img = Images(product_id=product_id, path=path)
+        img.variants = await generate_variants(img.path)
+        await img.save()
+        await invalidate_product(product_id)
+        return_images = []
+        for image in await product.images:
+            return_images.append({"id": image.id, "path": asset_url(image.path)})
+        return return_images
     except HTTPException:
         raise
 
 
 @router.get("/get-orders")
-async def get_orders(customer: Annotated[EmployeeSchema, Depends(get_employee)]):
+async def get_orders(
+    customer: Annotated[TokenPrincipal, Depends(get_employee_claims)],
+):
     try:
         orders = (
             await Orders.filter(status=OrderStatus.PACKING)
@@ -526,7 +602,7 @@ async def get_orders(customer: Annotated[EmployeeSchema, Depends(get_employee)])
 
 @router.get("/get-shipped-orders")
 async def get_shipped_orders(
-    customer: Annotated[EmployeeSchema, Depends(get_employee)],
+    customer: Annotated[TokenPrincipal, Depends(get_employee_claims)],
 ):
     try:
         orders = (
@@ -552,7 +628,7 @@ async def get_shipped_orders(
 
 @router.get("/get-delivered-orders")
 async def get_delivered_orders(
-    customer: Annotated[EmployeeSchema, Depends(get_employee)],
+    customer: Annotated[TokenPrincipal, Depends(get_employee_claims)],
 ):
     try:
         orders = (
@@ -578,7 +654,7 @@ async def get_delivered_orders(
 
 @router.post("/update-status-to-shipped")
 async def update_order_status(
-    id: int, customer: Annotated[EmployeeSchema, Depends(get_employee)]
+    id: int, customer: Annotated[TokenPrincipal, Depends(get_employee)]
 ):
     try:
         order = await Orders.get_or_none(id=id)
@@ -609,7 +685,7 @@ async def update_order_status(
 
 @router.post("/update-status-to-delivered")
 async def update_order_delivered(
-    id: int, customer: Annotated[EmployeeSchema, Depends(get_employee)]
+    id: int, customer: Annotated[TokenPrincipal, Depends(get_employee)]
 ):
     try:
         order = await Orders.get_or_none(id=id)
@@ -642,7 +718,7 @@ async def update_order_delivered(
     "/get-orders-details",
 )
 async def get_orders_details(
-    order_number, customer: Annotated[EmployeeSchema, Depends(get_employee)]
+    order_number, customer: Annotated[TokenPrincipal, Depends(get_employee_claims)]
 ):
     try:
         response = {"orderDetails": {}, "orderItems": []}
@@ -658,7 +734,7 @@ async def get_orders_details(
                 await OrderImageOut.from_tortoise_orm(item.product.images[0])
             ).model_dump()
             size = await Sizes.get_or_none(id=item.size_id)
-            product["image"] = BASELINK + image_dict["path"]
+            product["image"] = asset_url(image_dict["path"])
             product["size"] = size.size
             product["qty"] = item.qty
 
@@ -1,41 +1,36 @@
-from config import BASELINK
-from fastapi import HTTPException, APIRouter
-from models import Products, Inventory
+from config import PRODUCT_BATCH_LIMIT
+from fastapi import HTTPException, APIRouter, Request
+from schema import ProductBatchIn
+from utils import cached_catalog_response, fetch_product_detail, fetch_product_details
 
 router = APIRouter()
 
 
-@router.get("/{slug}")
-async def get_product(slug: str):
+# POST so it cannot be shadowed by a product whose slug is "batch"
+@router.post("/batch")
+async def get_products_batch(batch: ProductBatchIn):
     try:
-        product = await Products.get_or_none(slug=slug).prefetch_related("images")
-        if not product:
+        if not batch.slugs:
+            raise HTTPException(status_code=400, detail="No slugs given")
+        if len(batch.slugs) > PRODUCT_BATCH_LIMIT:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot fetch more than {PRODUCT_BATCH_LIMIT} products at once",
+            )
+        return await fetch_product_details(batch.slugs)
+    except HTTPException:
+        raise
+
+
+@router.get("/{slug}")
+async def get_product(request: Request, slug: str):
+    async def build():
+        product = await fetch_product_detail(slug)
+        if product is None:
             raise HTTPException(status_code=404, detail="Product not found")
-        response = {
-            "id": product.id,
-            "name": product.name,
-            "price": product.price,
-            "description": product.description,
-            "type": product.type,
-            "images": [],
-            "sizesAvailable": [],
-        }
+        return product
 
-        inventory = await Inventory.filter(product_id=product.id).prefetch_related(
-            "size"
-        )
-        if inventory:
-            for i in inventory:
-                if i.quantity >= 1:
-                    response["sizesAvailable"].append(
-                        {"size": i.size.size, "available": True}
-                    )
-                else:
-                    response["sizesAvailable"].append(
-                        {"size": i.size.size, "available": False}
-                    )
-        for image in product.images:
-            response["images"].append(BASELINK + image.path)
-        return response
+    try:
+        return await cached_catalog_response(request, build)
     except HTTPException:
         raise
@@ -1,309 +1,145 @@
-from typing import Literal
-from config import BASELINK
-from fastapi import HTTPException, APIRouter
-from models import Products
-from Enum.enum_definations import ProductType
+from typing import Annotated, Literal
+from config import SIZE_IDS
+from fastapi import HTTPException, APIRouter, Request, Query
+from utils import (
+    cached_catalog_response,
+    fetch_home_feed,
+    fetch_category_page,
+    fetch_category_facets,
+    search_products,
+    CATEGORIES,
+    static_asset_url,
+)
 
 router = APIRouter()
 
 
-@router.get("")
-async def get_products():
-    LIIMIT = 7
-    bannerImagesLg = [
-        {
-            "img": BASELINK + "static/public/shirts_banner.webp",
-            "link": "/products/shirts?page=1&sort=a",
-        },
-        {
-            "img": BASELINK + "static/public/pants_banner.webp",
-            "link": "/products/pants?page=1&sort=a",
-        },
-        {
-            "img": BASELINK + "static/public/t-shirts_banner.webp",
-            "link": "/products/t-shirts?page=1&sort=a",
-        },
-    ]
-    bannerImagesMb = [
-        {
-            "img": BASELINK + "static/public/shirts_banner_mb.webp",
-            "link": "/products/shirts?page=1&sort=a",
-        },
-        {
-            "img": BASELINK + "static/public/pants_banner_mb.webp",
-            "link": "/products/pants?page=1&sort=a",
-        },
-        {
-            "img": BASELINK + "static/public/t-shirts_banner_mb.webp",
-            "link": "/products/t-shirts?page=1&sort=a",
-        },
+BANNER_IMAGES_LG = [
+    {
+        "img": "static/public/shirts_banner.webp",
+        "link": "/products/shirts?page=1&sort=a",
+    },
+    {
+        "img": "static/public/pants_banner.webp",
+        "link": "/products/pants?page=1&sort=a",
+    },
+    {
+        "img": "static/public/t-shirts_banner.webp",
+        "link": "/products/t-shirts?page=1&sort=a",
+    },
+]
+BANNER_IMAGES_MB = [
+    {
+        "img": "static/public/shirts_banner_mb.webp",
+        "link": "/products/shirts?page=1&sort=a",
+    },
+    {
+        "img": "static/public/pants_banner_mb.webp",
+        "link": "/products/pants?page=1&sort=a",
+    },
+    {
+        "img": "static/public/t-shirts_banner_mb.webp",
+        "link": "/products/t-shirts?page=1&sort=a",
+    },
+]
+
+
+async def banner_images(banners: list[dict]) -> list[dict]:
+    return [
+        {**banner, "img": await static_asset_url(banner["img"])} for banner in banners
     ]
 
-    try:
-        shirts = (
-            await Products.filter(type=ProductType.SHIRTS)
-            .limit(LIIMIT)
-            .prefetch_related("images")
-        )
-        tshirts = (
-            await Products.filter(type=ProductType.TSHIRTS)
-            .limit(LIIMIT)
-            .prefetch_related("images")
-        )
-        pants = (
-            await Products.filter(type=ProductType.PANTS)
-            .limit(LIIMIT)
-            .prefetch_related("images")
-        )
-        joggers = (
-            await Products.filter(type=ProductType.JOGGERS)
-            .limit(LIIMIT)
-            .prefetch_related("images")
-        )
-
-        res_shirts = []
-        for product in shirts:
-            images = await product.images.all()
-            shirt_dict = dict(product)
-            image = images[0].path
-            shirt_dict["image"] = BASELINK + image
-            shirt_dict.pop("type")
-            shirt_dict.pop("description")
-            res_shirts.append(shirt_dict)
-
-        res_tshirts = []
-        for product in tshirts:
-            images = await product.images.all()
-            shirt_dict = dict(product)
-            image = images[0].path
-            shirt_dict["image"] = BASELINK + image
-            shirt_dict.pop("type")
-            shirt_dict.pop("description")
-            res_tshirts.append(shirt_dict)
-
-        res_pants = []
-        for product in pants:
-            images = await product.images.all()
-            pant_dict = dict(product)
-            image = images[0].path
-            pant_dict["image"] = BASELINK + image
-            pant_dict.pop("type")
-            pant_dict.pop("description")
-            res_pants.append(pant_dict)
-
-        res_joggers = []
-        for product in joggers:
-            images = await product.images.all()
-            joggers_dict = dict(product)
-            image = images[0].path
-            joggers_dict["image"] = BASELINK + image
-            joggers_dict.pop("type")
-            joggers_dict.pop("description")
-            res_joggers.append(joggers_dict)
 
+@router.get("")
+async def get_products(request: Request):
+    async def build():
         return {
-            "bannerImagesLg": bannerImagesLg,
-            "bannerImagesMb": bannerImagesMb,
-            "shirts": res_shirts,
-            "tshirts": res_tshirts,
-            "pants": res_pants,
-            "joggers": res_joggers,
+            "bannerImagesLg": await banner_images(BANNER_IMAGES_LG),
+            "bannerImagesMb": await banner_images(BANNER_IMAGES_MB),
+            **await fetch_home_feed(),
         }
-    except HTTPException:
-        raise
-
-
-@router.get("/pants")
-async def get_pants(
-    page: int = 1, per_page: int = 16, price_sort: Literal["a", "d"] = "a"
-):
-    sort = "price"
-    if price_sort == "d":
-        sort = "-price"
-    try:
-        if page < 1:
-            raise HTTPException(status_code=400, detail="Page cannont be less than 0")
-        if per_page < 1:
-            raise HTTPException(status_code=400, detail="Item count be less than 0")
-        offset = (page - 1) * per_page
-        # Get the products for the current page
-        products_data = (
-            await Products.filter(type=ProductType.PANTS)
-            .prefetch_related("images")
-            .order_by(sort)
-            .offset(offset)
-            .limit(per_page)
-        )
-        products = []
-        for product in products_data:
-            images = await product.images.all()
-            product_dict = dict(product)
-            image = images[0].path
-            product_dict["image"] = BASELINK + image
-            product_dict.pop("type")
-            product_dict.pop("description")
-            products.append(product_dict)
-
-        # Check if there are more products after the current page
-        next_page_products = (
-            await Products.filter(type=ProductType.PANTS)
-            .offset(offset + per_page)
-            .count()
-        )
-
-        if not products_data:
-            raise HTTPException(status_code=404, detail="No products found")
 
-        # Determine if there are more products for the next page
-        has_next_page = next_page_products > 0
-
-        return {"nextPage": has_next_page, "products": products}
-    except HTTPException:
-        raise
-
-
-@router.get("/shirts")
-async def get_shirts(
-    page: int = 1, per_page: int = 16, price_sort: Literal["a", "d"] = "a"
-):
-    sort = "price"
-    if price_sort == "d":
-        sort = "-price"
     try:
-        if page < 1:
-            raise HTTPException(status_code=400, detail="Page cannont be less than 0")
-        if per_page < 1:
-            raise HTTPException(status_code=400, detail="Item count be less than 0")
-        offset = (page - 1) * per_page
-        # Get the products for the current page
-        products_data = (
-            await Products.filter(type=ProductType.SHIRTS)
-            .order_by(sort)
-            .prefetch_related("images")
-            .offset(offset)
-            .limit(per_page)
-        )
-        products = []
-        for product in products_data:
-            images = await product.images.all()
-            product_dict = dict(product)
-            image = images[0].path
-            product_dict["image"] = BASELINK + image
-            product_dict.pop("type")
-            product_dict.pop("description")
-            products.append(product_dict)
-
-        # Check if there are more products after the current page
-        next_page_products = (
-            await Products.filter(type=ProductType.SHIRTS)
-            .offset(offset + per_page)
-            .count()
-        )
-
-        if not products_data:
-            raise HTTPException(status_code=404, detail="No products found")
-
-        # Determine if there are more products for the next page
-        has_next_page = next_page_products > 0
-
-        return {"nextPage": has_next_page, "products": products}
+        return await cached_catalog_response(request, build)
     except HTTPException:
         raise
 
 
-@router.get("/tshirts")
-async def get_tshirts(
-    page: int = 1, per_page: int = 16, price_sort: Literal["a", "d"] = "a"
+@router.get("/search")
+async def search(
+    request: Request,
+    q: str,
+    page: int = 1,
+    per_page: int = 16,
 ):
-    sort = "price"
-    if price_sort == "d":
-        sort = "-price"
     try:
+        q = q.strip()
+        if not q or len(q) > 100:
+            raise HTTPException(
+                status_code=400, detail="Search query must be 1 to 100 characters"
+            )
         if page < 1:
             raise HTTPException(status_code=400, detail="Page cannont be less than 0")
         if per_page < 1:
             raise HTTPException(status_code=400, detail="Item count be less than 0")
-        offset = (page - 1) * per_page
-        # Get the products for the current page
-        products_data = (
-            await Products.filter(type=ProductType.TSHIRTS)
-            .order_by(sort)
-            .prefetch_related("images")
-            .offset(offset)
-            .limit(per_page)
-        )
-        products = []
-        for product in products_data:
-            images = await product.images.all()
-            product_dict = dict(product)
-            image = images[0].path
-            product_dict["image"] = BASELINK + image
-            product_dict.pop("type")
-            product_dict.pop("description")
-            products.append(product_dict)
-
-        # Check if there are more products after the current page
-        next_page_products = (
-            await Products.filter(type=ProductType.TSHIRTS)
-            .offset(offset + per_page)
-            .count()
-        )
 
-        if not products_data:
-            raise HTTPException(status_code=404, detail="No products found")
+        async def build():
+            return await search_products(q, page, per_page)
 
-        # Determine if there are more products for the next page
-        has_next_page = next_page_products > 0
-
-        return {"nextPage": has_next_page, "products": products}
+        return await cached_catalog_response(request, build)
     except HTTPException:
         raise
 
 
-@router.get("/joggers")
-async def get_joggers(
-    page: int = 1, per_page: int = 16, price_sort: Literal["a", "d"] = "a"
+@router.get("/{category}")
+async def get_category(
+    request: Request,
+    category: str,
+    page: int = 1,
+    per_page: int = 16,
+    price_sort: Literal["a", "d"] = "a",
+    cursor: str | None = None,
+    min_price: int | None = None,
+    max_price: int | None = None,
+    size: Annotated[list[str] | None, Query()] = None,
 ):
-    sort = "price"
-    if price_sort == "d":
-        sort = "-price"
     try:
+        product_type = CATEGORIES.get(category)
+        if product_type is None:
+            raise HTTPException(status_code=404, detail="Category not found")
         if page < 1:
             raise HTTPException(status_code=400, detail="Page cannont be less than 0")
         if per_page < 1:
             raise HTTPException(status_code=400, detail="Item count be less than 0")
-        offset = (page - 1) * per_page
-        # Get the products for the current page
-        products_data = (
-            await Products.filter(type=ProductType.JOGGERS)
-            .order_by(sort)
-            .prefetch_related("images")
-            .offset(offset)
-            .limit(per_page)
-        )
-        products = []
-        for product in products_data:
-            images = await product.images.all()
-            product_dict = dict(product)
-            image = images[0].path
-            product_dict["image"] = BASELINK + image
-            product_dict.pop("type")
-            product_dict.pop("description")
-            products.append(product_dict)
-
-        # Check if there are more products after the current page
-        next_page_products = (
-            await Products.filter(type=ProductType.JOGGERS)
-            .offset(offset + per_page)
-            .count()
-        )
-
-        if not products_data:
-            raise HTTPException(status_code=404, detail="No products found")
-
-        # Determine if there are more products for the next page
-        has_next_page = next_page_products > 0
-
-        return {"nextPage": has_next_page, "products": products}
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise HTTPException(
+                status_code=400, detail="min_price cannot be more than max_price"
+            )
+        if size and any(s not in SIZE_IDS for s in size):
+            raise HTTPException(status_code=400, detail="Invalid size")
+        size_ids = [SIZE_IDS[s] for s in size] if size else None
+
+        async def build():
+            response = await fetch_category_page(
+                product_type,
+                per_page,
+                price_sort,
+                page=page,
+                cursor=cursor,
+                min_price=min_price,
+                max_price=max_price,
+                size_ids=size_ids,
+            )
+            if not response["products"]:
+                raise HTTPException(status_code=404, detail="No products found")
+            # Facets describe the whole filtered listing, only the first page needs them
+            response["facets"] = None
+            if page == 1 and cursor is None:
+                response["facets"] = await fetch_category_facets(
+                    product_type, min_price, max_price, size_ids
+                )
+            return response
+
+        return await cached_catalog_response(request, build)
     except HTTPException:
         raise
@@ -1,5 +1,11 @@
-from .account_schema import CustomerSchema, CustomerSignUp, TokenOut
-from .product_schema import CartSchema, ProductSchema, SizeSchema, WishlistSchema
+from .account_schema import CustomerSchema, CustomerSignUp, TokenOut, TokenPrincipal
+from .product_schema import (
+    CartSchema,
+    ProductSchema,
+    SizeSchema,
+    WishlistSchema,
+    ProductBatchIn,
+)
 from .action_schema import (
     AddToWishlistOut,
     AddToCartOut,
@@ -7,8 +13,10 @@ from .action_schema import (
     RemoveWishlistItemOut,
     MoveToCartIn,
     MoveToCartOut,
+    MoveItemsToCartIn,
     UpdateCartItemQtyIn,
     UpdateCartItemSizeIn,
+    CartBatchIn,
     NewAddressUserAddressIn,
     PaymentDetailsIn,
     OrderItemsOut,
@@ -37,10 +45,12 @@ __all__ = [
     CustomerSignUp,
     TokenOut,
     CustomerSchema,
+    TokenPrincipal,
     CartSchema,
     ProductSchema,
     SizeSchema,
     WishlistSchema,
+    ProductBatchIn,
     EmployeeSchema,
     NewEmployeeSchema,
     AllEmployeeOut,
@@ -60,8 +70,10 @@ __all__ = [
     RemoveWishlistItemOut,
     MoveToCartIn,
     MoveToCartOut,
+    MoveItemsToCartIn,
     UpdateCartItemQtyIn,
     UpdateCartItemSizeIn,
+    CartBatchIn,
     NewAddressUserAddressIn,
     PaymentDetailsIn,
     OrderItemsOut,
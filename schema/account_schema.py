@@ -30,6 +30,13 @@ class CustomerSchema(BaseModel):
     # wishlist_items = List[WishlistSchema]
 
 
+class TokenPrincipal(BaseModel):
+    id: int
+    username: str
+    is_disabled: bool
+    roles: list[str] = []
+
+
 class TokenOut(BaseModel):
     access_token: str
     token_type: Literal["bearer"]
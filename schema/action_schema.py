@@ -1,6 +1,6 @@
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Literal
+from typing import Annotated, Literal, Union
 from tortoise.contrib.pydantic import pydantic_model_creator
 from models.product_models import Images, Products
 
@@ -35,6 +35,10 @@ class MoveToCartOut(BaseModel):
     success: Literal["Item moved to cart"]
 
 
+class MoveItemsToCartIn(BaseModel):
+    items: list[MoveToCartIn]
+
+
 class UpdateCartItemQtyIn(BaseModel):
     id: int
     qty: int
@@ -48,6 +52,42 @@ class UpdateCartItemSizeIn(BaseModel):
     prevSize: Literal["s", "m", "l", "xl", "xxl", "32", "34", "36", "38", "40"]
 
 
+class CartQtyOp(BaseModel):
+    op: Literal["qty"]
+    id: int
+    qty: int
+    size: Literal["s", "m", "l", "xl", "xxl", "32", "34", "36", "38", "40"]
+
+
+class CartSizeOp(BaseModel):
+    op: Literal["size"]
+    id: int
+    size: Literal["s", "m", "l", "xl", "xxl", "32", "34", "36", "38", "40"]
+    prevSize: Literal["s", "m", "l", "xl", "xxl", "32", "34", "36", "38", "40"]
+
+
+class CartRemoveOp(BaseModel):
+    op: Literal["remove"]
+    id: int
+    size: Literal["s", "m", "l", "xl", "xxl", "32", "34", "36", "38", "40"]
+
+
+class CartMoveOp(BaseModel):
+    op: Literal["move"]
+    slug: str
+    qty: int
+    size: Literal["s", "m", "l", "xl", "xxl", "32", "34", "36", "38", "40"]
+
+
+class CartBatchIn(BaseModel):
+    ops: list[
+        Annotated[
+            Union[CartQtyOp, CartSizeOp, CartRemoveOp, CartMoveOp],
+            Field(discriminator="op"),
+        ]
+    ]
+
+
 class NewAddressUserAddressIn(BaseModel):
     name: str
     address: str
@@ -1,3 +1,4 @@
+from pydantic import BaseModel
 from Enum.enum_definations import ProductType
 
 
@@ -26,3 +27,7 @@ class ProductSchema:
 class WishlistSchema:
     id: str
     products: ProductSchema
+
+
+class ProductBatchIn(BaseModel):
+    slugs: list[str]
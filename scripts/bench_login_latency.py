@@ -0,0 +1,74 @@
+# Measures catalog latency while a burst of logins runs against the same server.
+#
+#   python scripts/bench_login_latency.py --base-url http://127.0.0.1:8000 \
+#       --username <user> --password <password>
+import asyncio
+import statistics
+import time
+
+import httpx
+import typer
+
+app = typer.Typer()
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def login_worker(client: httpx.AsyncClient, username, password, stop):
+    while not stop.is_set():
+        await client.post(
+            "/account/login", data={"username": username, "password": password}
+        )
+
+
+async def catalog_worker(client: httpx.AsyncClient, samples: list[float], stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/products")
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+async def run_phase(base_url, username, password, logins, readers, duration):
+    samples: list[float] = []
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        tasks = [
+            asyncio.create_task(login_worker(client, username, password, stop))
+            for _ in range(logins)
+        ]
+        tasks += [
+            asyncio.create_task(catalog_worker(client, samples, stop))
+            for _ in range(readers)
+        ]
+        await asyncio.sleep(duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+    return samples
+
+
+@app.command()
+def main(
+    base_url: str = "http://127.0.0.1:8000",
+    username: str = typer.Option(...),
+    password: str = typer.Option(...),
+    logins: int = 16,
+    readers: int = 8,
+    duration: float = 10.0,
+):
+    for label, login_count in (("catalog only", 0), ("catalog + logins", logins)):
+        samples = asyncio.run(
+            run_phase(base_url, username, password, login_count, readers, duration)
+        )
+        typer.echo(
+            f"{label:>18}: requests={len(samples)} "
+            f"p50={statistics.median(samples):.1f}ms "
+            f"p99={percentile(samples, 99):.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    app()
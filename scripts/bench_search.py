@@ -0,0 +1,119 @@
+# Seeds a throwaway database with generated products and compares the ranked
+# full text search against the ILIKE scan used by the admin product lookup.
+#
+#   python scripts/bench_search.py --products 100000
+import asyncio
+import copy
+import os
+import statistics
+import sys
+import time
+
+import typer
+from aerich import Command
+from tortoise import Tortoise, connections
+from tortoise.exceptions import OperationalError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import TORTOISE_ORM  # noqa: E402
+from models import Products  # noqa: E402
+from utils import search_products  # noqa: E402
+
+app = typer.Typer()
+
+WORDS = [
+    "cotton", "linen", "oxford", "denim", "flannel", "slim", "relaxed",
+    "cargo", "chino", "striped", "checked", "washed", "stretch", "classic",
+    "oversized", "cropped", "pleated", "hooded", "graphic", "vintage",
+]
+TERMS = ["linen", "slim denim", "vintage graphic", "striped oxford", "cargo"]
+
+SEED_SQL = """
+INSERT INTO products (name, slug, price, description, type)
+SELECT initcap(w[1 + (g * 7) % 20]) || ' ' || w[1 + (g * 13) % 20] || ' ' || g,
+       'bench-' || g,
+       100 + (g * 37) % 4900,
+       'A ' || w[1 + (g * 3) % 20] || ' ' || w[1 + (g * 11) % 20]
+           || ' piece made for everyday wear',
+       (ARRAY['Shirts', 'TShirts', 'Pants', 'Joggers'])[1 + g % 4]
+FROM generate_series(1, $1) g, (SELECT $2::text[] AS w) words
+"""
+
+
+def timings(samples: list[float]) -> str:
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"p50={statistics.median(ordered):.2f}ms p99={p99:.2f}ms"
+
+
+async def measure(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def run(products: int, repeat: int, database: str, keep: bool):
+    config = copy.deepcopy(TORTOISE_ORM)
+    config["connections"]["default"]["credentials"]["database"] = database
+    created = True
+    try:
+        await Tortoise.init(config=config, _create_db=True)
+        # The pool opened for CREATE DATABASE is not bound to the new database
+        await Tortoise.close_connections()
+    except OperationalError:
+        # Kept by an earlier --keep run, it is never dropped
+        created = False
+    command = Command(
+        tortoise_config=config, app="models", location=os.path.join(ROOT, "migrations")
+    )
+    await command.init()
+    try:
+        await command.upgrade(run_in_transaction=True)
+        conn = connections.get("default")
+        existing = await Products.all().count()
+        if existing < products:
+            typer.echo(f"Seeding {products - existing} products")
+            await conn.execute_query(SEED_SQL, [products - existing, WORDS])
+            await conn.execute_script(
+                "INSERT INTO images (path, product_id) "
+                "SELECT 'static/public/bench.webp', p.id FROM products p "
+                "WHERE NOT EXISTS (SELECT 1 FROM images i WHERE i.product_id = p.id);"
+                "ANALYZE products; ANALYZE images;"
+            )
+
+        for term in TERMS:
+            fts = await measure(lambda: search_products(term, 1, 16), repeat)
+            ilike = await measure(
+                lambda: Products.filter(name__icontains=term).limit(16), repeat
+            )
+            typer.echo(
+                f"{term!r:>20} search: {timings(fts)}  "
+                f"ilike (unranked): {timings(ilike)}"
+            )
+    finally:
+        if created and not keep:
+            await Tortoise._drop_databases()
+        else:
+            await Tortoise.close_connections()
+
+
+@app.command()
+def main(
+    products: int = 100000,
+    repeat: int = 50,
+    database: str = "products_bench",
+    keep: bool = False,
+):
+    if database == TORTOISE_ORM["connections"]["default"]["credentials"]["database"]:
+        typer.echo(f"{database} is the application database, pick another", err=True)
+        raise typer.Exit(code=1)
+    asyncio.run(run(products, repeat, database, keep))
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,87 @@
+import json
+import pytest
+from schema import TokenPrincipal
+from utils.route_utils import (
+    CART_SUMMARY_SQL,
+    CART_VERSION_SQL,
+    cart_cache,
+    cached_cart_summary_response,
+    connections,
+    get_cart_summary_response,
+)
+
+pytestmark = pytest.mark.anyio
+
+ADDRESS = {"id": 7, "name": "alice", "address": "1 Main St", "city": "c"}
+ITEM = {
+    "id": 1,
+    "slug": "shirts-item-0",
+    "name": "Shirts item 0",
+    "price": 500,
+    "qty": 2,
+    "size": "m",
+    "image": "static/public/1_0.webp",
+    "variants": None,
+}
+SUMMARY_ROW = {
+    "items": json.dumps([ITEM]),
+    "cart_before_tax": 1000,
+    "addresses": json.dumps([ADDRESS]),
+    "delivery_address": 7,
+    "version": 3,
+}
+
+
+class CountingConnection:
+    def __init__(self):
+        self.queries: list[str] = []
+
+    async def execute_query(self, sql, values=None):
+        self.queries.append(sql)
+        return 0, []
+
+    async def execute_query_dict(self, sql, values=None):
+        self.queries.append(sql)
+        if sql == CART_SUMMARY_SQL:
+            return [dict(SUMMARY_ROW)]
+        if sql == CART_VERSION_SQL:
+            return [{"version": SUMMARY_ROW["version"]}]
+        raise AssertionError(f"unexpected query: {sql}")
+
+    async def execute_many(self, sql, values):
+        self.queries.append(sql)
+
+    async def execute_script(self, sql):
+        self.queries.append(sql)
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    connection = CountingConnection()
+    monkeypatch.setattr(connections, "get", lambda alias: connection)
+    cart_cache.clear()
+    return connection
+
+
+@pytest.fixture
+def customer():
+    return TokenPrincipal(id=1, username="alice", is_disabled=False)
+
+
+async def test_cart_summary_is_one_query(connection, customer):
+    summary = await get_cart_summary_response(customer)
+    assert connection.queries == [CART_SUMMARY_SQL]
+    assert summary["cartBeforeTax"] == 1000
+    assert summary["deliveryAddress"] == ADDRESS
+    assert [item["id"] for item in summary["items"]] == [1]
+
+
+async def test_cached_cart_summary_checks_only_the_version(connection, customer):
+    request = type("FakeRequest", (), {"headers": {}})()
+    first = await cached_cart_summary_response(request, customer)
+    assert connection.queries == [CART_VERSION_SQL, CART_SUMMARY_SQL]
+
+    connection.queries.clear()
+    second = await cached_cart_summary_response(request, customer)
+    assert connection.queries == [CART_VERSION_SQL]
+    assert second.body == first.body
@@ -0,0 +1,118 @@
+import asyncio
+import importlib
+import json
+import pytest
+import fakeredis
+from utils.invalidation_bus import (
+    InvalidationBus,
+    PostgresInvalidationBus,
+    RedisInvalidationBus,
+)
+
+pytestmark = pytest.mark.anyio
+
+# utils re-exports the bus instance under the module's name
+bus_module = importlib.import_module("utils.invalidation_bus")
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        "redis.asyncio.from_url",
+        lambda url, **kwargs: fakeredis.FakeAsyncRedis(server=server, **kwargs),
+    )
+    return server
+
+
+def record(bus, topic: str) -> list:
+    events = []
+    bus.subscribe(topic, events.append)
+    return events
+
+
+async def wait_for(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+async def test_local_bus_delivers_to_the_topic_only():
+    bus = InvalidationBus()
+    catalog = record(bus, "catalog")
+    wishlist = record(bus, "wishlist")
+    await bus.publish("catalog", product_id=3)
+    assert catalog == [{"product_id": 3}]
+    assert wishlist == []
+
+
+async def test_postgres_bus_broadcasts_topic_and_fields(monkeypatch):
+    bus = PostgresInvalidationBus({})
+    events = record(bus, "catalog")
+    sent = []
+
+    async def broadcast(message):
+        sent.append(json.loads(message))
+
+    monkeypatch.setattr(bus, "_broadcast", broadcast)
+    await bus.publish("catalog", product_id=3)
+    assert events == [{"product_id": 3}]
+    assert sent == [{"topic": "catalog", "event": {"product_id": 3}}]
+
+    bus._on_message(json.dumps({"topic": "catalog", "event": {"product_id": 4}}))
+    assert events[-1] == {"product_id": 4}
+
+
+async def test_redis_bus_reaches_other_workers(redis_server):
+    worker_a = RedisInvalidationBus("redis://test")
+    worker_b = RedisInvalidationBus("redis://test")
+    await worker_a.start()
+    await worker_b.start()
+    events_a = record(worker_a, "wishlist")
+    events_b = record(worker_b, "wishlist")
+    try:
+        event = {"customer_id": 1}
+        await worker_a.publish("wishlist", customer_id=1)
+        await wait_for(lambda: event in events_b)
+        # The publisher drops locally right away and again when its message arrives
+        await wait_for(lambda: events_a.count(event) == 2)
+    finally:
+        await worker_a.close()
+        await worker_b.close()
+
+
+class BrokenPubSub:
+    async def listen(self):
+        raise ConnectionError("connection lost")
+        yield
+
+    async def aclose(self):
+        pass
+
+
+async def test_redis_listener_resubscribes_after_connection_loss(
+    redis_server, monkeypatch, caplog
+):
+    monkeypatch.setattr(bus_module, "RESUBSCRIBE_DELAY", 0)
+    publisher = RedisInvalidationBus("redis://test")
+    subscriber = RedisInvalidationBus("redis://test")
+    await publisher.start()
+    await subscriber.start()
+    sessions = record(subscriber, "sessions")
+    catalog = record(subscriber, "catalog")
+    try:
+        subscriber._listener_task.cancel()
+        subscriber._listener_task = asyncio.create_task(
+            subscriber._listen(BrokenPubSub())
+        )
+        # Whatever was published while disconnected is treated as missed
+        await wait_for(lambda: None in sessions and None in catalog)
+        assert "resubscribing" in caplog.text
+
+        await publisher.publish("catalog", product_id=3)
+        await wait_for(lambda: {"product_id": 3} in catalog)
+    finally:
+        await publisher.close()
+        await subscriber.close()
@@ -0,0 +1,34 @@
+import importlib
+import time
+import pytest
+from utils.revocation import RevocationList
+
+pytestmark = pytest.mark.anyio
+
+revocation_module = importlib.import_module("utils.revocation")
+
+
+class FailingRevokedToken:
+    @classmethod
+    async def create(cls, **fields):
+        raise AssertionError("revocation row written")
+
+
+def test_token_issued_at_revocation_instant_is_revoked():
+    revocations = RevocationList()
+    revoked_at = time.time()
+    revocations._users[("customer", 1)] = revoked_at
+    claims = {"user_id": 1, "jti": "a"}
+    assert revocations.is_revoked({**claims, "iat": revoked_at - 1}, "customer")
+    assert revocations.is_revoked({**claims, "iat": revoked_at}, "customer")
+    assert not revocations.is_revoked({**claims, "iat": revoked_at + 0.001}, "customer")
+    assert not revocations.is_revoked({**claims, "iat": revoked_at}, "employee")
+
+
+async def test_revocations_are_not_stored_without_stateless_auth(monkeypatch):
+    monkeypatch.setattr(revocation_module, "STATELESS_AUTH", False)
+    monkeypatch.setattr(revocation_module, "RevokedToken", FailingRevokedToken)
+    revocations = RevocationList()
+    await revocations.revoke_token({"jti": "a", "exp": time.time() + 60})
+    await revocations.revoke_user("customer", 1)
+    assert not revocations.is_revoked({"jti": "a", "user_id": 1}, "customer")
@@ -0,0 +1,130 @@
+import importlib
+from types import SimpleNamespace
+import pytest
+import fakeredis
+from utils.invalidation_bus import InvalidationBus
+from utils.session_store import (
+    SESSION_TOPIC,
+    DatabaseSessionStore,
+    InMemorySessionStore,
+    RedisSessionStore,
+)
+from utils.common_utils import token_digest
+
+pytestmark = pytest.mark.anyio
+
+# utils re-exports the store instance under the module's name
+session_store_module = importlib.import_module("utils.session_store")
+
+
+class FakeUser:
+    _meta = SimpleNamespace(db_table="customer")
+    rows: dict = {}
+
+    def __init__(self, id: int, username: str, token: str = ""):
+        self.id = id
+        self.username = username
+        self.token = token
+        FakeUser.rows[id] = self
+
+    @classmethod
+    async def get_or_none(cls, **filters):
+        for user in cls.rows.values():
+            if all(getattr(user, name) == value for name, value in filters.items()):
+                return user
+        return None
+
+
+@pytest.fixture
+def user():
+    FakeUser.rows = {}
+    return FakeUser(1, "alice")
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        "redis.asyncio.from_url",
+        lambda url, **kwargs: fakeredis.FakeAsyncRedis(server=server, **kwargs),
+    )
+    return server
+
+
+@pytest.fixture
+def bus():
+    return InvalidationBus()
+
+
+def record(bus) -> list:
+    events = []
+    bus.subscribe(SESSION_TOPIC, events.append)
+    return events
+
+
+async def test_database_store_loads_current_token(user, bus):
+    store = DatabaseSessionStore(bus)
+    events = record(bus)
+    user.token = "token-1"
+    await store.add(user, "token-1")
+    assert await store.load(FakeUser, "token-1", "alice") is user
+    assert await store.load(FakeUser, "token-0", "alice") is None
+    await store.revoke(user, "token-1")
+    assert events == [
+        {"table": "customer", "user_id": 1, "key": None},
+        {"table": "customer", "user_id": 1, "key": token_digest("token-1")},
+    ]
+
+
+async def test_memory_store_add_load_revoke(user, bus):
+    store = InMemorySessionStore(bus)
+    events = record(bus)
+    await store.add(user, "token-1")
+    await store.add(user, "token-2")
+    assert await store.load(FakeUser, "token-1", "alice") is user
+    await store.revoke(user, "token-1")
+    assert await store.load(FakeUser, "token-1", "alice") is None
+    assert await store.load(FakeUser, "token-2", "alice") is user
+    assert events == [
+        {"table": "customer", "user_id": 1, "key": token_digest("token-1")}
+    ]
+
+
+async def test_memory_store_expires_sessions(user, bus, monkeypatch):
+    store = InMemorySessionStore(bus)
+    monkeypatch.setattr(session_store_module, "SESSION_TTL", -1)
+    await store.add(user, "token-1")
+    assert await store.load(FakeUser, "token-1", "alice") is None
+
+
+async def test_redis_store_add_load_revoke(user, bus, redis_server):
+    store = RedisSessionStore(bus, "redis://test")
+    events = record(bus)
+    await store.start()
+    try:
+        await store.add(user, "token-1")
+        assert await store.load(FakeUser, "token-1", "alice") is user
+        assert await store.load(FakeUser, "token-2", "alice") is None
+        await store.revoke(user, "token-1")
+        assert await store.load(FakeUser, "token-1", "alice") is None
+        assert events == [
+            {"table": "customer", "user_id": 1, "key": token_digest("token-1")}
+        ]
+    finally:
+        await store.close()
+
+
+async def test_redis_store_shares_sessions_between_workers(user, bus, redis_server):
+    worker_a = RedisSessionStore(bus, "redis://test")
+    worker_b = RedisSessionStore(bus, "redis://test")
+    await worker_a.start()
+    await worker_b.start()
+    try:
+        # A revoke on one worker applies on the other
+        await worker_a.add(user, "token-1")
+        assert await worker_b.load(FakeUser, "token-1", "alice") is user
+        await worker_a.revoke(user, "token-1")
+        assert await worker_b.load(FakeUser, "token-1", "alice") is None
+    finally:
+        await worker_a.close()
+        await worker_b.close()
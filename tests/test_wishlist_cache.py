@@ -0,0 +1,87 @@
+import pytest
+from utils.wishlist_utils import (
+    WISHLIST_MEMBERSHIP_SQL,
+    connections,
+    drop_cached_wishlist,
+    get_wishlist_ids,
+    get_wishlist_membership,
+    wishlist_cache,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeConnection:
+    def __init__(self, rows: list[dict], during_query=None):
+        self.rows = rows
+        self.during_query = during_query
+        self.queries: list[str] = []
+
+    async def execute_query_dict(self, sql, values=None):
+        self.queries.append(sql)
+        if self.during_query is not None:
+            self.during_query()
+        return self.rows
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    wishlist_cache.clear()
+
+
+def use(monkeypatch, connection: FakeConnection) -> FakeConnection:
+    monkeypatch.setattr(connections, "get", lambda alias: connection)
+    return connection
+
+
+async def test_fill_is_cached(monkeypatch):
+    connection = use(monkeypatch, FakeConnection([{"product_id": 3}]))
+    assert await get_wishlist_ids(1) == {3}
+    assert await get_wishlist_ids(1) == {3}
+    assert len(connection.queries) == 1
+
+
+async def test_fill_racing_an_invalidation_is_not_cached(monkeypatch):
+    use(
+        monkeypatch,
+        FakeConnection(
+            [{"product_id": 3}],
+            during_query=lambda: drop_cached_wishlist({"customer_id": 1}),
+        ),
+    )
+    assert await get_wishlist_ids(1) == {3}
+    assert wishlist_cache.get(1) is None
+
+
+async def test_fill_racing_a_reset_is_not_cached(monkeypatch):
+    use(
+        monkeypatch,
+        FakeConnection(
+            [{"product_id": 3}], during_query=lambda: drop_cached_wishlist(None)
+        ),
+    )
+    await get_wishlist_ids(1)
+    assert wishlist_cache.get(1) is None
+
+
+async def test_other_customers_do_not_block_a_fill(monkeypatch):
+    use(
+        monkeypatch,
+        FakeConnection(
+            [{"product_id": 3}],
+            during_query=lambda: drop_cached_wishlist({"customer_id": 2}),
+        ),
+    )
+    await get_wishlist_ids(1)
+    assert wishlist_cache.get(1) == {3}
+
+
+async def test_membership_is_one_query(monkeypatch):
+    rows = [
+        {"slug": "shirt", "in_wishlist": True},
+        {"slug": "pants", "in_wishlist": False},
+    ]
+    connection = use(monkeypatch, FakeConnection(rows))
+    membership = await get_wishlist_membership(1, ["shirt", "pants", "nope", "shirt"])
+    assert membership == {"shirt": True, "pants": False, "nope": False}
+    assert connection.queries == [WISHLIST_MEMBERSHIP_SQL]
@@ -1,13 +1,127 @@
-from .common_utils import verify_password, get_password_hash, create_access_token
-from .customer_utils import get_customer
-from .employee_utils import get_employee
-from .route_utils import get_cart_summary_response
+from .common_utils import (
+    verify_password,
+    get_password_hash,
+    create_access_token,
+    token_digest,
+)
+from .customer_utils import get_customer, get_customer_claims, customer_cache
+from .employee_utils import (
+    get_employee,
+    get_employee_claims,
+    employee_cache,
+    employee_roles,
+)
+from .revocation import revocation_list
+from .route_utils import (
+    get_cart_summary_response,
+    cached_cart_summary_response,
+    cart_cache,
+    get_cart_delta_response,
+    bump_cart_version,
+)
+from .catalog_cache import (
+    catalog_cache,
+    bump_catalog_version,
+    product_cache,
+    invalidate_product,
+    cached_catalog_response,
+)
+from .catalog_utils import (
+    fetch_home_feed,
+    fetch_category_page,
+    fetch_category_facets,
+    fetch_product_detail,
+    fetch_product_details,
+    search_products,
+    CATEGORIES,
+)
+from .cart_utils import (
+    apply_cart_operations,
+    add_product_to_cart,
+    move_wishlist_item_to_cart,
+    move_wishlist_items_to_cart,
+    change_cart_item_size,
+)
+from .wishlist_utils import (
+    wishlist_cache,
+    get_wishlist_ids,
+    get_wishlist_membership,
+    fetch_wishlist_page,
+    WISHLIST_PAGE_SIZE,
+    invalidate_wishlist,
+)
+from .invalidation_bus import invalidation_bus
+from .session_store import session_store
+from .prefix_index import product_index
+from .rate_limit import login_throttle, login_throttle_stats
+from .assets import asset_url, static_asset_url, save_upload, AssetFiles
+from .image_service import (
+    image_pool,
+    generate_variants,
+    remove_variants,
+    thumbnail_path,
+)
+from .password_service import (
+    password_pool,
+    verify_and_update_password_async,
+    get_password_hash_async,
+)
 
 __all__ = [
     verify_password,
     get_password_hash,
     create_access_token,
+    token_digest,
     get_customer,
+    get_customer_claims,
+    customer_cache,
     get_employee,
+    get_employee_claims,
+    employee_cache,
+    employee_roles,
+    revocation_list,
     get_cart_summary_response,
+    cached_cart_summary_response,
+    cart_cache,
+    get_cart_delta_response,
+    bump_cart_version,
+    apply_cart_operations,
+    add_product_to_cart,
+    move_wishlist_item_to_cart,
+    move_wishlist_items_to_cart,
+    change_cart_item_size,
+    wishlist_cache,
+    get_wishlist_ids,
+    get_wishlist_membership,
+    fetch_wishlist_page,
+    WISHLIST_PAGE_SIZE,
+    invalidate_wishlist,
+    catalog_cache,
+    bump_catalog_version,
+    product_cache,
+    invalidate_product,
+    cached_catalog_response,
+    fetch_home_feed,
+    fetch_category_page,
+    fetch_category_facets,
+    fetch_product_detail,
+    fetch_product_details,
+    search_products,
+    CATEGORIES,
+    invalidation_bus,
+    session_store,
+    product_index,
+    login_throttle,
+    login_throttle_stats,
+    password_pool,
+    verify_and_update_password_async,
+    get_password_hash_async,
+    image_pool,
+    generate_variants,
+    remove_variants,
+    thumbnail_path,
+    asset_url,
+    static_asset_url,
+    save_upload,
+    AssetFiles,
 ]
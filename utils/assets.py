@@ -0,0 +1,241 @@
+import hashlib
+import os
+import re
+import stat
+from mimetypes import guess_type
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+from config import BASELINK
+
+HASH_LENGTH = 12
+HASHED_NAME = re.compile(
+    r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{%d})(?P<suffix>\.[^./\\]+)$" % HASH_LENGTH
+)
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+# Content-Encoding and file suffix of precompressed siblings, in preference order
+PRECOMPRESSED = [("br", ".br"), ("gzip", ".gz")]
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# path -> (mtime_ns, size, digest), rehashed only when the file changes
+_digests: dict[str, tuple[int, int, str]] = {}
+
+
+def hashed_path(path: str, digest: str) -> str:
+    stem, suffix = os.path.splitext(path)
+    return f"{stem}.{digest}{suffix}"
+
+
+def write_asset(path: str, content: bytes) -> str:
+    # Stored under its content hash, the file behind a URL never changes
+    path = hashed_path(path, hashlib.sha256(content).hexdigest()[:HASH_LENGTH])
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+async def save_upload(path: str, content: bytes) -> str:
+    return await anyio.to_thread.run_sync(write_asset, path, content)
+
+
+def file_digest(path: str) -> str | None:
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    cached = _digests.get(path)
+    if cached and cached[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+        return cached[2]
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()[:HASH_LENGTH]
+    _digests[path] = (stat_result.st_mtime_ns, stat_result.st_size, digest)
+    return digest
+
+
+def asset_url(path: str) -> str:
+    # Uploads and variants are saved through write_asset, their stored path
+    # already carries the hash
+    return BASELINK + path
+
+
+async def static_asset_url(path: str) -> str:
+    # For files deployed by hand, hashed off the event loop. Files missing on
+    # this host keep their plain name
+    digest = await anyio.to_thread.run_sync(file_digest, path)
+    if digest is None:
+        return BASELINK + path
+    return BASELINK + hashed_path(path, digest)
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    # One byte range, inclusive. None serves the whole file, which is what
+    # multiple ranges or an unknown unit get
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def lookup_precompressed(
+    full_path: str, accept_encoding: str
+) -> tuple[str, str, os.stat_result] | None:
+    accepted = accepted_encodings(accept_encoding)
+    for coding, suffix in PRECOMPRESSED:
+        if coding not in accepted:
+            continue
+        try:
+            stat_result = os.stat(full_path + suffix)
+        except OSError:
+            continue
+        if stat.S_ISREG(stat_result.st_mode):
+            return coding, full_path + suffix, stat_result
+    return None
+
+
+class AssetFileResponse(FileResponse):
+    offset = 0
+    count: int | None = None
+
+    def set_range(self, start: int, end: int):
+        self.status_code = 206
+        self.offset = start
+        self.count = end - start + 1
+        size = self.stat_result.st_size
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        count = self.stat_result.st_size - self.offset
+        if self.count is not None:
+            count = self.count
+        extensions = scope.get("extensions") or {}
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in extensions:
+            # The server hands the descriptor to sendfile, no copy through Python
+            with open(self.path, "rb") as file:
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": file,
+                        "offset": self.offset,
+                        "count": count,
+                        "more_body": False,
+                    }
+                )
+        elif self.count is None and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.offset)
+                more_body = True
+                while more_body:
+                    chunk = await file.read(min(self.chunk_size, count))
+                    count -= len(chunk)
+                    more_body = count > 0 and len(chunk) > 0
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk,
+                            "more_body": more_body,
+                        }
+                    )
+
+
+class AssetFiles(StaticFiles):
+    # StaticFiles plus hashed immutable names, precompressed siblings and ranges
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        match = HASHED_NAME.match(path)
+        # An existing hashed name was written by write_asset
+        immutable = stat_result is not None and match is not None
+        if stat_result is None and match is not None:
+            full_path, stat_result = await anyio.to_thread.run_sync(
+                self.lookup_path, match["stem"] + match["suffix"]
+            )
+            # An outdated hash still gets the current file, just not cached forever
+            digest = await anyio.to_thread.run_sync(file_digest, full_path)
+            immutable = digest == match["digest"]
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404)
+        return await self.asset_response(full_path, stat_result, scope, immutable)
+
+    async def asset_response(
+        self,
+        full_path: str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        immutable: bool,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        headers = {
+            "cache-control": IMMUTABLE if immutable else REVALIDATE,
+            "accept-ranges": "bytes",
+            "vary": "Accept-Encoding",
+        }
+        media_type = guess_type(full_path)[0] or "text/plain"
+        precompressed = None
+        if "range" not in request_headers:
+            precompressed = await anyio.to_thread.run_sync(
+                lookup_precompressed,
+                full_path,
+                request_headers.get("accept-encoding", ""),
+            )
+        if precompressed is not None:
+            coding, full_path, stat_result = precompressed
+            headers["content-encoding"] = coding
+
+        response = AssetFileResponse(
+            full_path, stat_result=stat_result, headers=headers, media_type=media_type
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and if_range in (None, response.headers["etag"]):
+            try:
+                byte_range = parse_range(range_header, stat_result.st_size)
+            except ValueError:
+                return Response(
+                    status_code=416,
+                    headers={"content-range": f"bytes */{stat_result.st_size}"},
+                )
+            if byte_range is not None:
+                response.set_range(*byte_range)
+        return response
@@ -0,0 +1,106 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self.pop(key)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            old_key, (_, old_value) = self._data.popitem(last=False)
+            self._on_evict(old_key, old_value)
+
+    def pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return None
+        self._on_evict(key, entry[1])
+        return entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _on_evict(self, key, value):
+        pass
+
+
+class PrincipalCache(TTLCache):
+    # Customers and employees resolved from a token, keyed by the token digest
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self._keys_by_user: dict[int, set[str]] = {}
+
+    def set(self, key, value):
+        super().set(key, value)
+        self._keys_by_user.setdefault(value.id, set()).add(key)
+
+    def discard_user(self, user_id: int):
+        for key in self._keys_by_user.pop(user_id, set()):
+            self.pop(key)
+
+    def clear(self):
+        super().clear()
+        self._keys_by_user.clear()
+
+    def _on_evict(self, key, value):
+        keys = self._keys_by_user.get(value.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[value.id]
+
+
+class ProductCache(TTLCache):
+    # Product detail payloads keyed by slug, admin edits drop them by product id
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self._keys_by_product: dict[int, str] = {}
+
+    def set(self, key, value):
+        super().set(key, value)
+        self._keys_by_product[value["id"]] = key
+
+    def discard_product(self, product_id: int):
+        key = self._keys_by_product.pop(product_id, None)
+        if key is not None:
+            self.pop(key)
+
+    def clear(self):
+        super().clear()
+        self._keys_by_product.clear()
+
+    def _on_evict(self, key, value):
+        if self._keys_by_product.get(value["id"]) == key:
+            del self._keys_by_product[value["id"]]
@@ -0,0 +1,199 @@
+from itertools import groupby
+from fastapi import HTTPException
+from tortoise.backends.base.client import BaseDBAsyncClient
+from config import SIZE_IDS
+from .route_utils import bump_cart_version
+
+MAX_CART_QTY = 10
+
+# Runs of qty and remove operations become one statement each
+SET_QTY_SQL = """
+UPDATE cart SET qty = changes.qty
+FROM unnest($2::int[], $3::int[], $4::int[]) AS changes (product_id, size_id, qty)
+WHERE cart.customer_id = $1
+  AND cart.product_id = changes.product_id
+  AND cart.size_id = changes.size_id
+RETURNING cart.product_id, cart.size_id
+"""
+
+REMOVE_LINES_SQL = """
+DELETE FROM cart
+USING unnest($2::int[], $3::int[]) AS lines (product_id, size_id)
+WHERE cart.customer_id = $1
+  AND cart.product_id = lines.product_id
+  AND cart.size_id = lines.size_id
+RETURNING cart.product_id, cart.size_id
+"""
+
+# Every path that adds to the cart goes through this upsert, a repeated add
+# raises the quantity of the existing line up to the cap
+ADD_TO_CART_SQL = """
+{source}
+INSERT INTO cart (customer_id, product_id, size_id, qty)
+{rows}
+ON CONFLICT (customer_id, product_id, size_id)
+DO UPDATE SET qty = LEAST(cart.qty + excluded.qty, {max_qty})
+RETURNING product_id
+"""
+
+ADD_PRODUCT_SQL = ADD_TO_CART_SQL.format(
+    source="",
+    rows="SELECT $1, p.id, $3, $4 FROM products p WHERE p.slug = $2",
+    max_qty=MAX_CART_QTY,
+)
+
+# Takes a product off the wishlist and adds it to the cart
+MOVE_TO_CART_SQL = ADD_TO_CART_SQL.format(
+    source="""
+WITH moved AS (
+    DELETE FROM wishlist w
+    USING products p
+    WHERE p.slug = $2 AND w.product_id = p.id AND w.customer_id = $1
+    RETURNING w.product_id
+)""",
+    rows="SELECT $1, moved.product_id, $3, $4 FROM moved",
+    max_qty=MAX_CART_QTY,
+)
+
+# The bulk form of MOVE_TO_CART_SQL, one wishlist row can feed several sizes
+MOVE_ITEMS_TO_CART_SQL = ADD_TO_CART_SQL.format(
+    source="""
+WITH items AS (
+    SELECT * FROM unnest($2::text[], $3::int[], $4::int[]) AS items (slug, size_id, qty)
+), moved AS (
+    DELETE FROM wishlist w
+    USING products p
+    WHERE p.slug = ANY($2) AND w.product_id = p.id AND w.customer_id = $1
+    RETURNING w.product_id, p.slug
+)""",
+    rows="SELECT $1, moved.product_id, items.size_id, items.qty "
+    "FROM moved JOIN items ON items.slug = moved.slug",
+    max_qty=MAX_CART_QTY,
+)
+
+# Moves a line to another size, merging into that size when it is in the cart
+CHANGE_SIZE_SQL = ADD_TO_CART_SQL.format(
+    source="""
+WITH moved AS (
+    DELETE FROM cart
+    WHERE customer_id = $1 AND product_id = $2 AND size_id = $3
+    RETURNING qty
+)""",
+    rows="SELECT $1, $2, $4, moved.qty FROM moved",
+    max_qty=MAX_CART_QTY,
+)
+
+
+def check_qty(qty: int):
+    if qty < 1 or qty > MAX_CART_QTY:
+        raise HTTPException(
+            status_code=400, detail=f"Item qty must be between 1 and {MAX_CART_QTY}."
+        )
+
+
+async def update_lines(
+    connection: BaseDBAsyncClient, sql: str, customer_id: int, lines: dict
+):
+    # lines maps (product_id, size_id) to the extra columns of the statement
+    keys = list(lines)
+    values = [
+        customer_id,
+        [product_id for product_id, _ in keys],
+        [size_id for _, size_id in keys],
+    ]
+    columns = list(zip(*lines.values()))
+    values += [list(column) for column in columns]
+    rows = await connection.execute_query_dict(sql, values)
+    if len(rows) < len(keys):
+        raise HTTPException(status_code=404, detail="Item not found in cart.")
+
+
+async def add_product_to_cart(
+    connection: BaseDBAsyncClient, customer_id: int, slug: str, size: str, qty: int
+):
+    check_qty(qty)
+    rows = await connection.execute_query_dict(
+        ADD_PRODUCT_SQL, [customer_id, slug, SIZE_IDS[size], qty]
+    )
+    if not rows:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+
+async def move_wishlist_item_to_cart(
+    connection: BaseDBAsyncClient, customer_id: int, slug: str, size: str, qty: int
+):
+    check_qty(qty)
+    rows = await connection.execute_query_dict(
+        MOVE_TO_CART_SQL, [customer_id, slug, SIZE_IDS[size], qty]
+    )
+    if not rows:
+        raise HTTPException(status_code=400, detail="Item not in user wishlist.")
+
+
+async def move_wishlist_items_to_cart(
+    connection: BaseDBAsyncClient, customer_id: int, items: list
+):
+    # Repeats of a slug and size are merged so the upsert touches each line once
+    lines = {}
+    for item in items:
+        check_qty(item.qty)
+        key = (item.slug, SIZE_IDS[item.size])
+        lines[key] = min(lines.get(key, 0) + item.qty, MAX_CART_QTY)
+    keys = list(lines)
+    rows = await connection.execute_query_dict(
+        MOVE_ITEMS_TO_CART_SQL,
+        [
+            customer_id,
+            [slug for slug, _ in keys],
+            [size_id for _, size_id in keys],
+            list(lines.values()),
+        ],
+    )
+    if len(rows) < len(keys):
+        raise HTTPException(status_code=400, detail="Item not in user wishlist.")
+    await bump_cart_version(customer_id, connection)
+
+
+async def change_cart_item_size(
+    connection: BaseDBAsyncClient,
+    customer_id: int,
+    product_id: int,
+    prev_size: str,
+    size: str,
+):
+    if size == prev_size:
+        return
+    rows = await connection.execute_query_dict(
+        CHANGE_SIZE_SQL, [customer_id, product_id, SIZE_IDS[prev_size], SIZE_IDS[size]]
+    )
+    if not rows:
+        raise HTTPException(status_code=404, detail="Item not found in cart.")
+
+
+async def apply_cart_operations(
+    customer_id: int, ops: list, connection: BaseDBAsyncClient
+):
+    # Ops run in the given order on the caller's transaction, any failure
+    # raises and rolls the whole batch back
+    for kind, run in groupby(ops, key=lambda op: op.op):
+        run = list(run)
+        if kind == "qty":
+            for op in run:
+                check_qty(op.qty)
+            # The last change to a line wins, as it would one by one
+            lines = {(op.id, SIZE_IDS[op.size]): (op.qty,) for op in run}
+            await update_lines(connection, SET_QTY_SQL, customer_id, lines)
+        elif kind == "remove":
+            lines = {(op.id, SIZE_IDS[op.size]): () for op in run}
+            await update_lines(connection, REMOVE_LINES_SQL, customer_id, lines)
+        elif kind == "size":
+            for op in run:
+                await change_cart_item_size(
+                    connection, customer_id, op.id, op.prevSize, op.size
+                )
+        elif kind == "move":
+            for op in run:
+                await move_wishlist_item_to_cart(
+                    connection, customer_id, op.slug, op.size, op.qty
+                )
+    await bump_cart_version(customer_id, connection)
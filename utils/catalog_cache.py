@@ -0,0 +1,83 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from config import (
+    CATALOG_CACHE_SIZE,
+    CATALOG_CACHE_TTL,
+    PRODUCT_CACHE_SIZE,
+    PRODUCT_CACHE_TTL,
+)
+from .cache import TTLCache, ProductCache
+from .invalidation_bus import invalidation_bus
+
+# Public catalog responses. Admin edits are broadcast on the invalidation bus so
+# every worker bumps its version
+catalog_cache = TTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+catalog_version = 0
+
+# Hot product pages, an edit only drops the product it touched
+product_cache = ProductCache(maxsize=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL)
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    version: int
+
+
+# Invalidation bus topic, events carry the edited product id or None when the
+# change is not about a single product
+CATALOG_TOPIC = "catalog"
+
+
+def drop_cached_catalog(event: dict | None):
+    global catalog_version
+    if event is None:
+        product_cache.clear()
+    elif event["product_id"] is not None:
+        product_cache.discard_product(event["product_id"])
+    catalog_version += 1
+
+
+invalidation_bus.subscribe(CATALOG_TOPIC, drop_cached_catalog)
+
+
+async def bump_catalog_version():
+    await invalidation_bus.publish(CATALOG_TOPIC, product_id=None)
+
+
+async def invalidate_product(product_id: int):
+    await invalidation_bus.publish(CATALOG_TOPIC, product_id=product_id)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+async def cached_catalog_response(
+    request: Request, build: Callable[[], Awaitable[dict]]
+) -> Response:
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    entry = catalog_cache.get(key)
+    if entry is None or entry.version != catalog_version:
+        # Taken before the build so an edit made meanwhile is not cached as current
+        version = catalog_version
+        body = JSONResponse(jsonable_encoder(await build())).body
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        entry = CachedResponse(body=body, etag=etag, version=version)
+        catalog_cache.set(key, entry)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "public, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=entry.body, media_type="application/json", headers=headers
+    )
@@ -0,0 +1,314 @@
+import base64
+import json
+from fastapi import HTTPException
+from tortoise import connections
+from config import SIZE_IDS
+from Enum.enum_definations import ProductType
+from .catalog_cache import product_cache
+from .assets import asset_url
+from .image_service import thumbnail_path
+
+HOME_FEED_LIMIT = 7
+
+# Ranks products per type and joins the first image of the top rows only
+HOME_FEED_SQL = """
+SELECT ranked.id, ranked.name, ranked.slug, ranked.price, ranked.type,
+       first_image.path AS image,
+       first_image.variants
+FROM (
+    SELECT p.id, p.name, p.slug, p.price, p.type,
+           ROW_NUMBER() OVER (PARTITION BY p.type ORDER BY p.id) AS position
+    FROM products p
+    WHERE EXISTS (SELECT 1 FROM images i WHERE i.product_id = p.id)
+) ranked
+JOIN LATERAL (
+    SELECT i.path, i.variants FROM images i
+    WHERE i.product_id = ranked.id
+    ORDER BY i.id
+    LIMIT 1
+) first_image ON TRUE
+WHERE ranked.position <= $1
+ORDER BY ranked.type, ranked.position
+"""
+
+
+def serialize_product_tile(row: dict) -> dict:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "slug": row["slug"],
+        "price": row["price"],
+        "image": asset_url(thumbnail_path(row["image"], row["variants"])),
+    }
+
+
+async def fetch_home_feed(limit: int = HOME_FEED_LIMIT) -> dict:
+    rows = await connections.get("default").execute_query_dict(HOME_FEED_SQL, [limit])
+    feed = {product_type.value: [] for product_type in ProductType}
+    for row in rows:
+        feed[row["type"]].append(serialize_product_tile(row))
+    return {
+        product_type.value.lower(): feed[product_type.value]
+        for product_type in ProductType
+    }
+
+
+# Listing sort modes, column and direction, id breaks ties
+LISTING_SORTS = {
+    "a": ("price", "ASC"),
+    "d": ("price", "DESC"),
+}
+
+CATEGORIES = {product_type.value.lower(): product_type for product_type in ProductType}
+
+# Upper bounds of the price facet buckets, the last bucket is open ended
+PRICE_BUCKETS = [500, 1000, 1500, 2000]
+
+# Products without images are not listed. The check runs before the LIMIT so an
+# image-less product can never take a slot on a page
+HAS_IMAGE = "EXISTS (SELECT 1 FROM images i WHERE i.product_id = p.id)"
+
+# Keyset pagination on (sort column, id), deep pages cost the same as the first one
+CATEGORY_PAGE_SQL = """
+SELECT page.id, page.name, page.slug, page.price, first_image.path AS image,
+       first_image.variants
+FROM (
+    SELECT p.id, p.name, p.slug, p.price
+    FROM products p
+    WHERE {where}
+    ORDER BY p.{column} {direction}, p.id {direction}
+    LIMIT ${limit} OFFSET ${offset}
+) page
+JOIN LATERAL (
+    SELECT i.path, i.variants FROM images i
+    WHERE i.product_id = page.id
+    ORDER BY i.id
+    LIMIT 1
+) first_image ON TRUE
+ORDER BY page.{column} {direction}, page.id {direction}
+"""
+
+# Counts per in stock size and per price bucket over the filtered listing,
+# both groupings come out of one scan
+CATEGORY_FACETS_SQL = """
+SELECT GROUPING(s.size) = 0 AS is_size, s.size,
+       width_bucket(p.price, ${buckets}::int[]) AS bucket,
+       COUNT(DISTINCT p.id) AS count
+FROM products p
+LEFT JOIN inventory inv ON inv.product_id = p.id AND inv.quantity > 0
+LEFT JOIN sizes s ON s.id = inv.size_id
+WHERE {where}
+GROUP BY GROUPING SETS ((s.size), (bucket))
+"""
+
+
+def listing_filters(
+    product_type: ProductType,
+    min_price: int | None,
+    max_price: int | None,
+    size_ids: list[int] | None,
+) -> tuple[list[str], list]:
+    # Shared by the page and its facets so the counts match what is listed
+    conditions = ["p.type = $1", HAS_IMAGE]
+    values = [product_type.value]
+    if min_price is not None:
+        values.append(min_price)
+        conditions.append(f"p.price >= ${len(values)}")
+    if max_price is not None:
+        values.append(max_price)
+        conditions.append(f"p.price <= ${len(values)}")
+    if size_ids:
+        values.append(size_ids)
+        conditions.append(
+            "EXISTS (SELECT 1 FROM inventory inv WHERE inv.product_id = p.id "
+            f"AND inv.size_id = ANY(${len(values)}) AND inv.quantity > 0)"
+        )
+    return conditions, values
+
+
+def encode_cursor(row: dict, sort: str) -> str:
+    column, _ = LISTING_SORTS[sort]
+    payload = json.dumps([row[column], row["id"], sort]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple[int, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, product_id, cursor_sort = json.loads(base64.urlsafe_b64decode(padded))
+        if cursor_sort != sort:
+            raise ValueError
+        return int(value), int(product_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def fetch_category_facets(
+    product_type: ProductType,
+    min_price: int | None = None,
+    max_price: int | None = None,
+    size_ids: list[int] | None = None,
+) -> dict:
+    conditions, values = listing_filters(product_type, min_price, max_price, size_ids)
+    values.append(PRICE_BUCKETS)
+    sql = CATEGORY_FACETS_SQL.format(
+        where=" AND ".join(conditions), buckets=len(values)
+    )
+    rows = await connections.get("default").execute_query_dict(sql, values)
+
+    bounds = [0] + PRICE_BUCKETS + [None]
+    sizes = {}
+    prices = []
+    for row in rows:
+        if row["is_size"]:
+            if row["size"] is not None:
+                sizes[row["size"]] = row["count"]
+        else:
+            prices.append(
+                {
+                    "min": bounds[row["bucket"]],
+                    "max": bounds[row["bucket"] + 1],
+                    "count": row["count"],
+                }
+            )
+    return {
+        "sizes": [
+            {"size": size, "count": sizes[size]} for size in SIZE_IDS if size in sizes
+        ],
+        "prices": sorted(prices, key=lambda bucket: bucket["min"]),
+    }
+
+
+async def fetch_category_page(
+    product_type: ProductType,
+    per_page: int,
+    sort: str,
+    page: int = 1,
+    cursor: str | None = None,
+    min_price: int | None = None,
+    max_price: int | None = None,
+    size_ids: list[int] | None = None,
+) -> dict:
+    column, direction = LISTING_SORTS[sort]
+    conditions, values = listing_filters(product_type, min_price, max_price, size_ids)
+    offset = (page - 1) * per_page
+    if cursor is not None:
+        operator = "<" if direction == "DESC" else ">"
+        values += list(decode_cursor(cursor, sort))
+        conditions.append(
+            f"(p.{column}, p.id) {operator} (${len(values) - 1}, ${len(values)})"
+        )
+        offset = 0
+    values += [per_page + 1, offset]
+    sql = CATEGORY_PAGE_SQL.format(
+        where=" AND ".join(conditions),
+        column=column,
+        direction=direction,
+        limit=len(values) - 1,
+        offset=len(values),
+    )
+    rows = await connections.get("default").execute_query_dict(sql, values)
+
+    # One extra row tells if there is a next page without a count query
+    has_next_page = len(rows) > per_page
+    rows = rows[:per_page]
+    return {
+        "nextPage": has_next_page,
+        "nextCursor": encode_cursor(rows[-1], sort) if has_next_page else None,
+        "products": [serialize_product_tile(row) for row in rows],
+    }
+
+
+# Products, images and size availability for a set of slugs in one round trip
+PRODUCT_DETAIL_SQL = """
+SELECT p.id, p.slug, p.name, p.price, p.description, p.type,
+       COALESCE(
+           (SELECT json_agg(i.path ORDER BY i.id)
+            FROM images i WHERE i.product_id = p.id),
+           '[]'
+       ) AS images,
+       COALESCE(
+           (SELECT json_agg(
+                json_build_object('size', s.size, 'available', inv.quantity >= 1)
+                ORDER BY inv.id
+            )
+            FROM inventory inv JOIN sizes s ON s.id = inv.size_id
+            WHERE inv.product_id = p.id),
+           '[]'
+       ) AS sizes
+FROM products p
+WHERE p.slug = ANY($1)
+"""
+
+
+def serialize_product_detail(row: dict) -> dict:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "price": row["price"],
+        "description": row["description"],
+        "type": row["type"],
+        "images": [asset_url(path) for path in json.loads(row["images"])],
+        "sizesAvailable": json.loads(row["sizes"]),
+    }
+
+
+async def fetch_product_details(slugs: list[str]) -> dict[str, dict]:
+    products = {}
+    missing = []
+    for slug in dict.fromkeys(slugs):
+        product = product_cache.get(slug)
+        if product is None:
+            missing.append(slug)
+        else:
+            products[slug] = product
+    if missing:
+        rows = await connections.get("default").execute_query_dict(
+            PRODUCT_DETAIL_SQL, [missing]
+        )
+        for row in rows:
+            product = serialize_product_detail(row)
+            product_cache.set(row["slug"], product)
+            products[row["slug"]] = product
+    # Same order as requested, unknown slugs are left out
+    return {slug: products[slug] for slug in dict.fromkeys(slugs) if slug in products}
+
+
+async def fetch_product_detail(slug: str) -> dict | None:
+    return (await fetch_product_details([slug])).get(slug)
+
+
+SEARCH_SQL = """
+SELECT page.id, page.name, page.slug, page.price, page.type,
+       first_image.path AS image,
+       first_image.variants
+FROM (
+    SELECT p.id, p.name, p.slug, p.price, p.type,
+           ts_rank_cd(p.search_vector, query) AS rank
+    FROM products p, websearch_to_tsquery('english', $1) query
+    WHERE p.search_vector @@ query AND {has_image}
+    ORDER BY rank DESC, p.id
+    LIMIT $2 OFFSET $3
+) page
+JOIN LATERAL (
+    SELECT i.path, i.variants FROM images i
+    WHERE i.product_id = page.id
+    ORDER BY i.id
+    LIMIT 1
+) first_image ON TRUE
+ORDER BY page.rank DESC, page.id
+""".format(has_image=HAS_IMAGE)
+
+
+async def search_products(query: str, page: int, per_page: int) -> dict:
+    rows = await connections.get("default").execute_query_dict(
+        SEARCH_SQL, [query, per_page + 1, (page - 1) * per_page]
+    )
+    has_next_page = len(rows) > per_page
+    return {
+        "nextPage": has_next_page,
+        "products": [
+            {**serialize_product_tile(row), "type": row["type"]}
+            for row in rows[:per_page]
+        ],
+    }
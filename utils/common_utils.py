@@ -1,3 +1,5 @@
+import hashlib
+from uuid import uuid4
 from datetime import datetime, timedelta, timezone
 from jose import jwt
 from config import (
@@ -12,6 +14,14 @@ def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password, hashed_password):
+    # Returns (valid, new_hash), new_hash is set when the stored hash is outdated
+    valid = pwd_context.verify(plain_password, hashed_password)
+    if valid and pwd_context.needs_update(hashed_password):
+        return valid, pwd_context.hash(plain_password)
+    return valid, None
+
+
 def get_password_hash(password):
     return pwd_context.hash(password)
 
@@ -21,7 +31,13 @@ def create_access_token(
     expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
 ):
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + expires_delta
-    to_encode.update({"exp": expire})
+    now = datetime.now(timezone.utc)
+    expire = now + expires_delta
+    # A sub-second iat so revocations can tell apart tokens issued in one second
+    to_encode.update({"exp": expire, "iat": now.timestamp(), "jti": uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
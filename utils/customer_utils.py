@@ -5,12 +5,36 @@ from config import (
     SECRET_KEY,
     ALGORITHM,
     oauth2_scheme,
+    PRINCIPAL_CACHE_SIZE,
+    PRINCIPAL_CACHE_TTL,
+    STATELESS_AUTH,
 )
 from models import Customer
-from schema import CustomerSchema
+from schema import TokenPrincipal
+from .cache import PrincipalCache
+from .common_utils import token_digest
+from .invalidation_bus import invalidation_bus
+from .session_store import session_store, SESSION_TOPIC
+from .revocation import revocation_list
 
+customer_cache = PrincipalCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
 
-async def get_customer(token: Annotated[str, Depends(oauth2_scheme)]) -> CustomerSchema:
+
+def drop_cached_customer(event: dict | None):
+    if event is None:
+        customer_cache.clear()
+    elif event["table"] != Customer._meta.db_table:
+        return
+    elif event["key"] is not None:
+        customer_cache.pop(event["key"])
+    else:
+        customer_cache.discard_user(event["user_id"])
+
+
+invalidation_bus.subscribe(SESSION_TOPIC, drop_cached_customer)
+
+
+async def get_customer(token: Annotated[str, Depends(oauth2_scheme)]) -> TokenPrincipal:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("username")
@@ -20,13 +44,21 @@ async def get_customer(token: Annotated[str, Depends(oauth2_scheme)]) -> Custome
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        customer = await Customer.get_or_none(username=username, token=token)
+        key = token_digest(token)
+        customer = customer_cache.get(key)
         if customer is None:
-            raise HTTPException(
-                status_code=401,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
+            user = await session_store.load(Customer, token, username)
+            if user is None:
+                raise HTTPException(
+                    status_code=401,
+                    detail="Could not validate credentials",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            # Only the identity is cached, routes read profile fields themselves
+            customer = TokenPrincipal(
+                id=user.id, username=user.username, is_disabled=user.is_disabled
             )
+            customer_cache.set(key, customer)
         if customer.is_disabled:
             raise HTTPException(status_code=400, detail="Inactive user")
         return customer
@@ -50,3 +82,41 @@ async def get_customer(token: Annotated[str, Depends(oauth2_scheme)]) -> Custome
         )
     except HTTPException:
         raise
+
+
+async def get_customer_claims(
+    token: Annotated[str, Depends(oauth2_scheme)],
+) -> TokenPrincipal:
+    # For read-only routes that only need the customer id
+    if not STATELESS_AUTH:
+        return await get_customer(token)
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(
+            status_code=403,
+            detail="Token expired",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    except jwt.JWTError:
+        raise HTTPException(
+            status_code=403,
+            detail="Token has Invalid.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # Tokens issued before claims were added still go through the database
+    if payload.get("user_id") is None:
+        return await get_customer(token)
+    if revocation_list.is_revoked(payload, Customer._meta.db_table):
+        raise HTTPException(
+            status_code=401,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if payload.get("disabled"):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return TokenPrincipal(
+        id=payload["user_id"],
+        username=payload["username"],
+        is_disabled=payload["disabled"],
+    )
@@ -5,33 +5,82 @@ from config import (
     SECRET_KEY,
     ALGORITHM,
     oauth2_scheme,
+    PRINCIPAL_CACHE_SIZE,
+    PRINCIPAL_CACHE_TTL,
+    STATELESS_AUTH,
 )
 from models import Employee
+from schema import TokenPrincipal
+from .cache import PrincipalCache
+from .common_utils import token_digest
+from .invalidation_bus import invalidation_bus
+from .session_store import session_store, SESSION_TOPIC
+from .revocation import revocation_list
 
+employee_cache = PrincipalCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
 
-async def get_employee(token: Annotated[str, Depends(oauth2_scheme)]):
+
+def drop_cached_employee(event: dict | None):
+    if event is None:
+        employee_cache.clear()
+    elif event["table"] != Employee._meta.db_table:
+        return
+    elif event["key"] is not None:
+        employee_cache.pop(event["key"])
+    else:
+        employee_cache.discard_user(event["user_id"])
+
+
+invalidation_bus.subscribe(SESSION_TOPIC, drop_cached_employee)
+
+
+def employee_roles(employee: Employee) -> list[str]:
+    roles = []
+    if employee.is_superuser:
+        roles.append("is_superuser")
+    if employee.is_admin:
+        roles.append("is_admin")
+    if employee.is_staff:
+        roles.append("is_staff")
+    return roles
+
+
+async def get_employee(token: Annotated[str, Depends(oauth2_scheme)]) -> TokenPrincipal:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("username")
         if username is None:
             raise
-        employee = await Employee.get_or_none(username=username, token=token)
+        key = token_digest(token)
+        employee = employee_cache.get(key)
         if employee is None:
-            raise HTTPException(
-                status_code=401,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
+            user = await session_store.load(Employee, token, username)
+            if user is None:
+                raise HTTPException(
+                    status_code=401,
+                    detail="Could not validate credentials",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            if not employee_roles(user):
+                user.token = ""
+                await user.save(update_fields=["token"])
+                await session_store.revoke(user, token)
+                raise HTTPException(
+                    status_code=403,
+                    detail="Unauthorized",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            # Only the identity and roles are cached, a change to either
+            # invalidates the user on every worker
+            employee = TokenPrincipal(
+                id=user.id,
+                username=user.username,
+                is_disabled=user.is_disabled,
+                roles=employee_roles(user),
             )
+            employee_cache.set(key, employee)
         if employee.is_disabled:
             raise HTTPException(status_code=400, detail="Inactive user")
-        if any([employee.is_admin, employee.is_superuser, employee.is_staff]) is False:
-            employee.token = ""
-            await employee.save()
-            raise HTTPException(
-                status_code=403,
-                detail="Unauthorized",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
         return employee
     except jwt.JWTClaimsError:
         raise HTTPException(
@@ -53,3 +102,48 @@ async def get_employee(token: Annotated[str, Depends(oauth2_scheme)]):
         )
     except HTTPException:
         raise
+
+
+async def get_employee_claims(
+    token: Annotated[str, Depends(oauth2_scheme)],
+) -> TokenPrincipal:
+    # For read-only routes that only need the employee id and roles
+    if not STATELESS_AUTH:
+        return await get_employee(token)
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(
+            status_code=401,
+            detail="Token expired",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    except jwt.JWTError:
+        raise HTTPException(
+            status_code=401,
+            detail="Token has Invalid.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # Tokens issued before claims were added still go through the database
+    if payload.get("user_id") is None:
+        return await get_employee(token)
+    if revocation_list.is_revoked(payload, Employee._meta.db_table):
+        raise HTTPException(
+            status_code=401,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if payload.get("disabled"):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    if not payload.get("roles"):
+        raise HTTPException(
+            status_code=403,
+            detail="Unauthorized",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return TokenPrincipal(
+        id=payload["user_id"],
+        username=payload["username"],
+        is_disabled=payload["disabled"],
+        roles=payload["roles"],
+    )
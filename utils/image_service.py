@@ -0,0 +1,60 @@
+import io
+import json
+import logging
+import os
+from PIL import Image, ImageOps, UnidentifiedImageError
+from config import IMAGE_VARIANT_WIDTHS, IMAGE_WORKERS
+from .assets import write_asset
+from .process_pool import ProcessPool
+
+logger = logging.getLogger(__name__)
+
+image_pool = ProcessPool(max_workers=IMAGE_WORKERS)
+
+VARIANTS_DIR = "static/public/variants"
+THUMBNAIL_WIDTH = str(min(IMAGE_VARIANT_WIDTHS))
+
+
+def make_variants(path: str) -> dict[str, str]:
+    # Fixed width WebP copies of an upload, keyed by width
+    stem = os.path.splitext(os.path.basename(path))[0]
+    variants = {}
+    try:
+        with Image.open(path) as upload:
+            original = ImageOps.exif_transpose(upload)
+            original = original.convert(
+                "RGBA" if original.has_transparency_data else "RGB"
+            )
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        logger.exception("Cannot make variants of %s", path)
+        return variants
+    os.makedirs(VARIANTS_DIR, exist_ok=True)
+    for width in IMAGE_VARIANT_WIDTHS:
+        variant = original
+        # Never upscale, a small upload is stored as is in the wider slots
+        if original.width > width:
+            height = round(original.height * width / original.width)
+            variant = original.resize((width, height), Image.LANCZOS)
+        encoded = io.BytesIO()
+        variant.save(encoded, "WEBP", quality=80, method=4)
+        variants[str(width)] = write_asset(
+            f"{VARIANTS_DIR}/{stem}_{width}.webp", encoded.getvalue()
+        )
+    return variants
+
+
+async def generate_variants(path: str) -> dict[str, str]:
+    return await image_pool.run(make_variants, path)
+
+
+def remove_variants(variants: dict | None):
+    for path in (variants or {}).values():
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def thumbnail_path(path: str, variants: dict | str | None) -> str:
+    # Raw queries hand jsonb back as text
+    if isinstance(variants, str):
+        variants = json.loads(variants)
+    return (variants or {}).get(THUMBNAIL_WIDTH, path)
@@ -0,0 +1,200 @@
+import asyncio
+import contextlib
+import json
+import logging
+from abc import abstractmethod
+from typing import Callable
+from tortoise import connections
+from config import INVALIDATION_BACKEND, REDIS_URL, TORTOISE_ORM
+
+INVALIDATION_CHANNEL = "cache:invalidated"
+# Postgres channel names are identifiers
+NOTIFY_CHANNEL = "cache_invalidated"
+RESUBSCRIBE_DELAY = 1  # Seconds
+LISTENER_PING_INTERVAL = 30  # Seconds
+
+logger = logging.getLogger(__name__)
+
+# Called with the fields of an event, or with None when events may have been
+# missed and everything cached for the topic has to go
+InvalidationListener = Callable[[dict | None], None]
+
+
+class InvalidationBus:
+    # Tells the per-worker caches that rows changed. This one only reaches the
+    # current process, use it for a single worker or tests
+    def __init__(self):
+        self._listeners: dict[str, list[InvalidationListener]] = {}
+
+    def subscribe(self, topic: str, listener: InvalidationListener):
+        self._listeners.setdefault(topic, []).append(listener)
+
+    def _deliver(self, topic: str, event: dict | None):
+        for listener in self._listeners.get(topic, []):
+            listener(event)
+
+    def _deliver_reset(self):
+        for topic in self._listeners:
+            self._deliver(topic, None)
+
+    async def publish(self, topic: str, **event):
+        self._deliver(topic, event)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class BroadcastInvalidationBus(InvalidationBus):
+    # Events are sent to every worker, each one drops its cached copies
+    def __init__(self):
+        super().__init__()
+        self._listener_task: asyncio.Task | None = None
+
+    async def start(self):
+        subscription = await self._subscribe()
+        self._listener_task = asyncio.create_task(self._listen(subscription))
+
+    async def close(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener_task
+            self._listener_task = None
+
+    async def _listen(self, subscription):
+        while True:
+            try:
+                if subscription is None:
+                    subscription = await self._subscribe()
+                    # Anything published while unsubscribed was missed
+                    self._deliver_reset()
+                await self._receive(subscription)
+                raise ConnectionError("Invalidation subscription ended")
+            except asyncio.CancelledError:
+                if subscription is not None:
+                    await self._unsubscribe(subscription)
+                raise
+            except Exception:
+                logger.exception("Invalidation listener failed, resubscribing")
+                if subscription is not None:
+                    try:
+                        await self._unsubscribe(subscription)
+                    except Exception:
+                        pass
+                    subscription = None
+                await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+    def _on_message(self, data: str):
+        message = json.loads(data)
+        self._deliver(message["topic"], message["event"])
+
+    async def publish(self, topic: str, **event):
+        # This worker receives its own message too, drop locally right away anyway
+        self._deliver(topic, event)
+        await self._broadcast(json.dumps({"topic": topic, "event": event}))
+
+    @abstractmethod
+    async def _subscribe(self):
+        pass
+
+    @abstractmethod
+    async def _receive(self, subscription):
+        pass
+
+    @abstractmethod
+    async def _unsubscribe(self, subscription):
+        pass
+
+    @abstractmethod
+    async def _broadcast(self, message: str):
+        pass
+
+
+class PostgresInvalidationBus(BroadcastInvalidationBus):
+    # LISTEN/NOTIFY on the application database
+    def __init__(self, credentials: dict):
+        super().__init__()
+        self.credentials = credentials
+
+    async def _subscribe(self):
+        import asyncpg
+
+        connection = await asyncpg.connect(
+            host=self.credentials["host"],
+            port=int(self.credentials["port"]),
+            user=self.credentials["user"],
+            password=self.credentials["password"],
+            database=self.credentials["database"],
+        )
+        await connection.add_listener(
+            NOTIFY_CHANNEL, lambda conn, pid, channel, data: self._on_message(data)
+        )
+        return connection
+
+    async def _receive(self, connection):
+        # Notifications arrive through the listener callback, a failing ping
+        # means the connection is gone
+        while True:
+            await asyncio.sleep(LISTENER_PING_INTERVAL)
+            await connection.execute("SELECT 1")
+
+    async def _unsubscribe(self, connection):
+        await connection.close(timeout=5)
+
+    async def _broadcast(self, message: str):
+        # Inside a transaction the notification is delivered on commit
+        await connections.get("default").execute_query(
+            "SELECT pg_notify($1, $2)", [NOTIFY_CHANNEL, message]
+        )
+
+
+class RedisInvalidationBus(BroadcastInvalidationBus):
+    def __init__(self, url: str):
+        super().__init__()
+        self.url = url
+        self._redis = None
+
+    async def start(self):
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+        await super().start()
+
+    async def close(self):
+        await super().close()
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def _subscribe(self):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        return pubsub
+
+    async def _receive(self, pubsub):
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                self._on_message(message["data"])
+
+    async def _unsubscribe(self, pubsub):
+        await pubsub.aclose()
+
+    async def _broadcast(self, message: str):
+        await self._redis.publish(INVALIDATION_CHANNEL, message)
+
+
+def create_invalidation_bus(backend: str) -> InvalidationBus:
+    if backend == "database":
+        credentials = TORTOISE_ORM["connections"]["default"]["credentials"]
+        return PostgresInvalidationBus(credentials)
+    if backend == "memory":
+        return InvalidationBus()
+    if backend == "redis":
+        return RedisInvalidationBus(REDIS_URL)
+    raise ValueError(f"Unknown invalidation backend: {backend}")
+
+
+invalidation_bus = create_invalidation_bus(INVALIDATION_BACKEND)
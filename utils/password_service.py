@@ -0,0 +1,20 @@
+from config import PASSWORD_HASH_WORKERS
+from .common_utils import (
+    verify_and_update_password,
+    get_password_hash,
+)
+from .process_pool import ProcessPool
+
+password_pool = ProcessPool(max_workers=PASSWORD_HASH_WORKERS)
+
+
+async def verify_and_update_password_async(
+    plain_password, hashed_password
+) -> tuple[bool, str | None]:
+    return await password_pool.run(
+        verify_and_update_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password) -> str:
+    return await password_pool.run(get_password_hash, password)
@@ -0,0 +1,85 @@
+import asyncio
+import bisect
+import logging
+from models import Products
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixIndex:
+    # Sorted (key, product id) pairs, a prefix lookup is one bisect and a short scan
+    def __init__(self):
+        self._keys: list[tuple[str, int]] = []
+        self._products: dict[int, dict] = {}
+        self._refresh_task: asyncio.Task | None = None
+
+    def __len__(self):
+        return len(self._products)
+
+    @staticmethod
+    def _keys_for(product_id: int, name: str, slug: str) -> set[tuple[str, int]]:
+        # Every word of the name starts a key so "shirt" finds "Oxford Shirt"
+        words = name.lower().split()
+        keys = {(" ".join(words[i:]), product_id) for i in range(len(words))}
+        keys.add((slug, product_id))
+        return keys
+
+    def build(self, rows: list[tuple[int, str, str]]):
+        products = {}
+        keys = set()
+        for product_id, name, slug in rows:
+            products[product_id] = {"id": product_id, "name": name, "slug": slug}
+            keys |= self._keys_for(product_id, name, slug)
+        self._products = products
+        self._keys = sorted(keys)
+
+    def remove(self, product_id: int):
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+        for key in self._keys_for(product_id, product["name"], product["slug"]):
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    def add(self, product_id: int, name: str, slug: str):
+        self.remove(product_id)
+        self._products[product_id] = {"id": product_id, "name": name, "slug": slug}
+        for key in self._keys_for(product_id, name, slug):
+            bisect.insort(self._keys, key)
+
+    def search(self, prefix: str, limit: int = 10) -> list[dict]:
+        prefix = prefix.lower().strip()
+        results = {}
+        index = bisect.bisect_left(self._keys, (prefix,))
+        while index < len(self._keys) and len(results) < limit:
+            key, product_id = self._keys[index]
+            if not key.startswith(prefix):
+                break
+            results.setdefault(product_id, self._products[product_id])
+            index += 1
+        return list(results.values())
+
+    async def refresh(self):
+        self.build(await Products.all().values_list("id", "name", "slug"))
+
+    async def _refresh_forever(self, interval: int):
+        # Picks up edits made through other workers
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Product index refresh failed")
+
+    async def start(self, interval: int):
+        await self.refresh()
+        self._refresh_task = asyncio.create_task(self._refresh_forever(interval))
+
+    async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+
+product_index = PrefixIndex()
@@ -0,0 +1,27 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ProcessPool:
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    def start(self):
+        if self._executor is None:
+            # spawn instead of fork, forking a process that runs an event loop is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        # Without a started pool (scripts, shell) this uses the default thread pool
+        return await loop.run_in_executor(self._executor, fn, *args)
@@ -0,0 +1,127 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Annotated
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import OAuth2PasswordRequestForm
+from config import (
+    LOGIN_THROTTLE_BACKEND,
+    LOGIN_USER_BURST,
+    LOGIN_USER_PER_MINUTE,
+    LOGIN_IP_BURST,
+    LOGIN_IP_PER_MINUTE,
+    REDIS_URL,
+)
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class TokenBucketLimiter:
+    def __init__(self, capacity: int, per_minute: int, maxsize: int = 100000):
+        self.capacity = capacity
+        self.rate = per_minute / 60
+        self.maxsize = maxsize
+        self.allowed = 0
+        self.shed = 0
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def _take(self, key: str) -> tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    async def acquire(self, key: str) -> tuple[bool, int]:
+        # Returns (allowed, seconds until the next attempt is allowed)
+        allowed, tokens = await self._take(key)
+        if allowed:
+            self.allowed += 1
+            return True, 0
+        self.shed += 1
+        return False, math.ceil((1 - tokens) / self.rate)
+
+    def stats(self) -> dict:
+        return {"allowed": self.allowed, "shed": self.shed}
+
+
+class RedisTokenBucketLimiter(TokenBucketLimiter):
+    # Buckets shared by every worker, counters stay per worker
+    def __init__(self, url: str, prefix: str, capacity: int, per_minute: int):
+        super().__init__(capacity, per_minute)
+        from redis import asyncio as aioredis
+
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._script = self._redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def _take(self, key: str) -> tuple[bool, float]:
+        allowed, tokens = await self._script(
+            keys=[f"{self.prefix}:{key}"],
+            args=[self.capacity, self.rate, time.time()],
+        )
+        return bool(allowed), float(tokens)
+
+
+def create_limiter(prefix: str, capacity: int, per_minute: int) -> TokenBucketLimiter:
+    if LOGIN_THROTTLE_BACKEND == "redis":
+        return RedisTokenBucketLimiter(REDIS_URL, prefix, capacity, per_minute)
+    return TokenBucketLimiter(capacity, per_minute)
+
+
+login_user_limiter = create_limiter(
+    "throttle:login:user", LOGIN_USER_BURST, LOGIN_USER_PER_MINUTE
+)
+login_ip_limiter = create_limiter(
+    "throttle:login:ip", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE
+)
+
+
+def login_throttle(scope: str):
+    # Runs before the user lookup and the bcrypt check
+    async def throttle(
+        request: Request,
+        form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    ):
+        ip = request.client.host if request.client else "unknown"
+        for limiter, key in (
+            (login_ip_limiter, f"{scope}:{ip}"),
+            (login_user_limiter, f"{scope}:{form_data.username.lower()}"),
+        ):
+            allowed, retry_after = await limiter.acquire(key)
+            if not allowed:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many login attempts",
+                    headers={"Retry-After": str(retry_after)},
+                )
+
+    return throttle
+
+
+def login_throttle_stats() -> dict:
+    return {
+        "username": login_user_limiter.stats(),
+        "ip": login_ip_limiter.stats(),
+    }
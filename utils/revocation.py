@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from jose import jwt
+from config import ACCESS_TOKEN_EXPIRE_MINUTES, STATELESS_AUTH
+from models import RevokedToken
+from .session_store import session_store
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationList:
+    # Unexpired revocations mirrored from the revoked_token table
+    def __init__(self):
+        self._jtis: dict[str, float] = {}
+        self._users: dict[tuple[str, int], float] = {}
+        self._synced_at: datetime | None = None
+        self._sync_task: asyncio.Task | None = None
+
+    def is_revoked(self, claims: dict, table: str) -> bool:
+        if claims.get("jti") in self._jtis:
+            return True
+        revoked_at = self._users.get((table, claims.get("user_id")))
+        # Tokens issued in the same instant as the revocation are revoked too
+        return revoked_at is not None and claims.get("iat", 0) <= revoked_at
+
+    async def revoke_token(self, claims: dict):
+        # Session lookups already reject it when tokens are not stateless
+        if not STATELESS_AUTH or claims.get("jti") is None:
+            return
+        expires_at = datetime.fromtimestamp(claims["exp"], timezone.utc)
+        await RevokedToken.create(jti=claims["jti"], expires_at=expires_at)
+        self._jtis[claims["jti"]] = claims["exp"]
+
+    async def revoke_replaced_token(self, token: str):
+        # The database session backend keeps one token per user, logging in
+        # again ends the previous one
+        if not token or not session_store.single_session:
+            return
+        try:
+            claims = jwt.get_unverified_claims(token)
+        except jwt.JWTError:
+            return
+        await self.revoke_token(claims)
+
+    async def revoke_user(self, table: str, user_id: int):
+        if not STATELESS_AUTH:
+            return
+        # Every token issued before now is rejected until the newest one expires
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        await RevokedToken.create(
+            user_table=table, user_id=user_id, expires_at=expires_at
+        )
+        self._users[(table, user_id)] = now.timestamp()
+
+    def _add(self, row: RevokedToken):
+        if row.jti is not None:
+            self._jtis[row.jti] = row.expires_at.timestamp()
+        else:
+            key = (row.user_table, row.user_id)
+            revoked_at = row.revoked_at.timestamp()
+            self._users[key] = max(self._users.get(key, 0), revoked_at)
+
+    async def sync(self):
+        now = datetime.now(timezone.utc)
+        rows = RevokedToken.filter(expires_at__gt=now)
+        if self._synced_at is not None:
+            # Overlap the previous sync so rows committed late are not missed
+            rows = rows.filter(revoked_at__gte=self._synced_at - timedelta(seconds=5))
+        for row in await rows:
+            self._add(row)
+        self._synced_at = now
+
+        timestamp = now.timestamp()
+        self._jtis = {k: v for k, v in self._jtis.items() if v > timestamp}
+        lifetime = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        self._users = {k: v for k, v in self._users.items() if v + lifetime > timestamp}
+        await RevokedToken.filter(expires_at__lte=now).delete()
+
+    async def _sync_forever(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Revocation list sync failed")
+
+    async def start(self, interval: int):
+        await self.sync()
+        self._sync_task = asyncio.create_task(self._sync_forever(interval))
+
+    async def close(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+
+
+revocation_list = RevocationList()
@@ -1,15 +1,153 @@
-from models import Cart, Address, Customer
-from config import BASELINK, TAXRATE
+import hashlib
+import json
+from dataclasses import dataclass
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from schema import TokenPrincipal
+from config import SIZE_IDS, TAXRATE, CART_CACHE_SIZE, CART_CACHE_TTL
+from .assets import asset_url
+from .cache import TTLCache
+from . import catalog_cache as catalog
+from .image_service import thumbnail_path
 
+# Rendered cart summaries per customer. The cart version is checked against the
+# database on every read, catalog edits reach every worker through catalog_version
+cart_cache = TTLCache(maxsize=CART_CACHE_SIZE, ttl=CART_CACHE_TTL)
 
-async def get_cart_summary_response(customer: Customer) -> dict:
-    cart_list = await Cart.filter(customer_id=customer.id).prefetch_related(
-        "product__cart_item",
-        "product__images",
-        "size__cart_item_size",
-        "product__inventory__size",
+
+@dataclass
+class CartSnapshot:
+    body: bytes
+    etag: str
+    version: int
+    catalog_version: int
+
+# Cart lines with first image and size availability as one json array,
+# {lines} narrows it down to some (product_id, size_id) pairs
+CART_LINES_SQL = """
+SELECT json_agg(
+    json_build_object(
+        'id', p.id,
+        'slug', p.slug,
+        'name', p.name,
+        'type', p.type,
+        'image', first_image.path,
+        'variants', first_image.variants,
+        'qty', c.qty,
+        'size', s.size,
+        'price', p.price,
+        'availableSize', COALESCE(stock.available, json_build_object())
     )
-    cart = []
+    ORDER BY c.id
+)
+FROM cart c
+JOIN products p ON p.id = c.product_id
+JOIN sizes s ON s.id = c.size_id
+LEFT JOIN LATERAL (
+    SELECT i.path, i.variants FROM images i
+    WHERE i.product_id = p.id
+    ORDER BY i.id
+    LIMIT 1
+) first_image ON TRUE
+LEFT JOIN LATERAL (
+    SELECT json_object_agg(inv_size.size, inv.quantity > 0 ORDER BY inv.id)
+        AS available
+    FROM inventory inv JOIN sizes inv_size ON inv_size.id = inv.size_id
+    WHERE inv.product_id = p.id
+) stock ON TRUE
+WHERE c.customer_id = $1 {lines}
+"""
+
+CART_TOTAL_SQL = """
+SELECT COALESCE(SUM(p.price * c.qty), 0)
+FROM cart c JOIN products p ON p.id = c.product_id
+WHERE c.customer_id = $1
+"""
+
+CART_VERSION_SQL = "SELECT version FROM cart_state WHERE customer_id = $1"
+
+# Lines, pre-tax total, addresses and cart version in a single round trip
+CART_SUMMARY_SQL = """
+SELECT
+    COALESCE(({lines}), '[]') AS items,
+    ({total}) AS cart_before_tax,
+    COALESCE(
+        (SELECT json_agg(a ORDER BY a.id) FROM address a WHERE a.customer_id = $1),
+        '[]'
+    ) AS addresses,
+    (SELECT delivery_address FROM customer WHERE id = $1) AS delivery_address,
+    COALESCE(({version}), 0) AS version
+""".format(
+    lines=CART_LINES_SQL.format(lines=""),
+    total=CART_TOTAL_SQL,
+    version=CART_VERSION_SQL,
+)
+
+# Only the given lines, with the totals and version they belong to
+CART_DELTA_SQL = """
+SELECT
+    COALESCE(({lines}), '[]') AS items,
+    ({total}) AS cart_before_tax,
+    COALESCE(({version}), 0) AS version
+""".format(
+    lines=CART_LINES_SQL.format(
+        lines="AND (c.product_id, c.size_id) IN "
+        "(SELECT * FROM unnest($2::int[], $3::int[]))"
+    ),
+    total=CART_TOTAL_SQL,
+    version=CART_VERSION_SQL,
+)
+
+SIZE_NAMES = {size_id: size for size, size_id in SIZE_IDS.items()}
+
+BUMP_CART_VERSION_SQL = """
+INSERT INTO cart_state (customer_id, version) VALUES ($1, 1)
+ON CONFLICT (customer_id) DO UPDATE SET version = cart_state.version + 1
+RETURNING version
+"""
+
+
+def serialize_cart_item(item: dict) -> dict:
+    variants = item.pop("variants")
+    if item["image"] is not None:
+        item["image"] = asset_url(thumbnail_path(item["image"], variants))
+    return item
+
+
+def cart_totals(cart_before_tax: int) -> dict:
+    gst = (cart_before_tax * TAXRATE) / 100
+    return {
+        "cartBeforeTax": cart_before_tax,
+        "gst": gst,
+        "cartTotal": cart_before_tax + gst,
+    }
+
+
+async def bump_cart_version(
+    customer_id: int, connection: BaseDBAsyncClient | None = None
+) -> int:
+    # Run it on the transaction of the write so the two commit together
+    connection = connection or connections.get("default")
+    rows = await connection.execute_query_dict(BUMP_CART_VERSION_SQL, [customer_id])
+    return rows[0]["version"]
+
+
+async def get_cart_version(customer_id: int) -> int:
+    rows = await connections.get("default").execute_query_dict(
+        CART_VERSION_SQL, [customer_id]
+    )
+    return rows[0]["version"] if rows else 0
+
+
+async def get_cart_summary_response(customer: TokenPrincipal) -> dict:
+    rows = await connections.get("default").execute_query_dict(
+        CART_SUMMARY_SQL, [customer.id]
+    )
+    summary = rows[0]
+    cart = [serialize_cart_item(item) for item in json.loads(summary["items"])]
     response = {
         "cartBeforeTax": 0,
         "gst": 0,
@@ -17,38 +155,75 @@ async def get_cart_summary_response(customer: Customer) -> dict:
         "items": cart,
         "addresses": [],
         "deliveryAddress": [],
+        "version": summary["version"],
     }
 
-    if not cart_list:
+    if not cart:
         return response
 
-    for item in cart_list:
-        response["cartBeforeTax"] += item.product.price * item.qty
-        cart.append(
-            {
-                "id": item.product.id,
-                "slug": item.product.slug,
-                "name": item.product.name,
-                "type": item.product.type,
-                "image": BASELINK + item.product.images[0].path,
-                "qty": item.qty,
-                "size": item.size.size,
-                "price": item.product.price,
-                "availableSize": {
-                    i.size.size: True if i.quantity > 0 else False
-                    for i in item.product.inventory
-                },
-            }
-        )
-    gst = (response["cartBeforeTax"] * TAXRATE) / 100
-    response["gst"] = gst
-    response["cartTotal"] = response["cartBeforeTax"] + gst
-    user_addresses = await Address.filter(customer_id=customer.id)
+    response.update(cart_totals(summary["cart_before_tax"]))
+    user_addresses = json.loads(summary["addresses"])
     delivery_address = {}
     for address in user_addresses:
-        if address.id == customer.delivery_address:
+        if address["id"] == summary["delivery_address"]:
             delivery_address = address
             break
     response["addresses"] = user_addresses
     response["deliveryAddress"] = delivery_address
     return response
+
+
+async def get_cart_delta_response(
+    customer: TokenPrincipal, lines: list[tuple[int, int]]
+) -> dict:
+    # Changed lines and fresh totals, lines that no longer exist come back in
+    # "removed". A client whose version is not one behind refetches the summary
+    product_ids = [product_id for product_id, _ in lines]
+    size_ids = [size_id for _, size_id in lines]
+    rows = await connections.get("default").execute_query_dict(
+        CART_DELTA_SQL, [customer.id, product_ids, size_ids]
+    )
+    delta = rows[0]
+    items = [serialize_cart_item(item) for item in json.loads(delta["items"])]
+    present = {(item["id"], item["size"]) for item in items}
+    removed = []
+    for product_id, size_id in dict.fromkeys(lines):
+        if (product_id, SIZE_NAMES[size_id]) not in present:
+            removed.append({"id": product_id, "size": SIZE_NAMES[size_id]})
+    return {
+        "version": delta["version"],
+        "items": items,
+        "removed": removed,
+        **cart_totals(delta["cart_before_tax"]),
+    }
+
+
+async def cached_cart_summary_response(
+    request: Request, customer: TokenPrincipal
+) -> Response:
+    # One primary key lookup decides if the rendered summary is still current
+    version = await get_cart_version(customer.id)
+    snapshot = cart_cache.get(customer.id)
+    if (
+        snapshot is None
+        or snapshot.version != version
+        or snapshot.catalog_version != catalog.catalog_version
+    ):
+        catalog_version = catalog.catalog_version
+        summary = await get_cart_summary_response(customer)
+        body = JSONResponse(jsonable_encoder(summary)).body
+        snapshot = CartSnapshot(
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+            # The version read with the summary, a write made meanwhile is newer
+            version=summary["version"],
+            catalog_version=catalog_version,
+        )
+        cart_cache.set(customer.id, snapshot)
+
+    headers = {"ETag": snapshot.etag, "Cache-Control": "private, no-cache"}
+    if catalog.etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=snapshot.body, media_type="application/json", headers=headers
+    )
@@ -0,0 +1,133 @@
+import time
+from abc import ABC, abstractmethod
+from tortoise.models import Model
+from config import ACCESS_TOKEN_EXPIRE_MINUTES, SESSION_BACKEND, REDIS_URL
+from .common_utils import token_digest
+from .invalidation_bus import InvalidationBus, invalidation_bus
+
+SESSION_TTL = ACCESS_TOKEN_EXPIRE_MINUTES * 60  # Seconds
+# Invalidation bus topic, events carry the user table, the user id and the
+# digest of a single revoked token or None for all of them
+SESSION_TOPIC = "sessions"
+
+
+class SessionStore(ABC):
+    # True when logging in ends the user's previous session
+    single_session = False
+
+    def __init__(self, bus: InvalidationBus):
+        self.bus = bus
+
+    async def _publish(self, table: str, user_id: int, key: str | None):
+        await self.bus.publish(SESSION_TOPIC, table=table, user_id=user_id, key=key)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def add(self, user: Model, token: str):
+        pass
+
+    @abstractmethod
+    async def load(self, model: type[Model], token: str, username: str):
+        pass
+
+    @abstractmethod
+    async def revoke(self, user: Model, token: str):
+        pass
+
+    async def invalidate_user(self, user: Model):
+        await self._publish(user._meta.db_table, user.id, None)
+
+
+class DatabaseSessionStore(SessionStore):
+    # One session per user, stored in the token column of the user table
+    single_session = True
+
+    async def add(self, user: Model, token: str):
+        # Logging in replaces the previous token
+        await self.invalidate_user(user)
+
+    async def load(self, model: type[Model], token: str, username: str):
+        return await model.get_or_none(username=username, token=token)
+
+    async def revoke(self, user: Model, token: str):
+        await self._publish(user._meta.db_table, user.id, token_digest(token))
+
+
+class InMemorySessionStore(SessionStore):
+    # Sessions live in this process only, use it for a single worker or tests
+    def __init__(self, bus: InvalidationBus):
+        super().__init__(bus)
+        self._sessions: dict[str, tuple[int, float]] = {}
+
+    async def add(self, user: Model, token: str):
+        key = f"{user._meta.db_table}:{token_digest(token)}"
+        self._sessions[key] = (user.id, time.monotonic() + SESSION_TTL)
+
+    async def load(self, model: type[Model], token: str, username: str):
+        key = f"{model._meta.db_table}:{token_digest(token)}"
+        session = self._sessions.get(key)
+        if session is None:
+            return None
+        user_id, expires_at = session
+        if expires_at < time.monotonic():
+            del self._sessions[key]
+            return None
+        return await model.get_or_none(id=user_id)
+
+    async def revoke(self, user: Model, token: str):
+        digest = token_digest(token)
+        self._sessions.pop(f"{user._meta.db_table}:{digest}", None)
+        await self._publish(user._meta.db_table, user.id, digest)
+
+
+class RedisSessionStore(SessionStore):
+    # Shared by every worker
+    def __init__(self, bus: InvalidationBus, url: str):
+        super().__init__(bus)
+        self.url = url
+        self._redis = None
+
+    async def start(self):
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def add(self, user: Model, token: str):
+        key = f"session:{user._meta.db_table}:{token_digest(token)}"
+        await self._redis.set(key, user.id, ex=SESSION_TTL)
+
+    async def load(self, model: type[Model], token: str, username: str):
+        user_id = await self._redis.get(
+            f"session:{model._meta.db_table}:{token_digest(token)}"
+        )
+        if user_id is None:
+            return None
+        return await model.get_or_none(id=int(user_id))
+
+    async def revoke(self, user: Model, token: str):
+        digest = token_digest(token)
+        await self._redis.delete(f"session:{user._meta.db_table}:{digest}")
+        await self._publish(user._meta.db_table, user.id, digest)
+
+
+def create_session_store(backend: str, bus: InvalidationBus) -> SessionStore:
+    if backend == "database":
+        return DatabaseSessionStore(bus)
+    if backend == "memory":
+        return InMemorySessionStore(bus)
+    if backend == "redis":
+        return RedisSessionStore(bus, REDIS_URL)
+    raise ValueError(f"Unknown session backend: {backend}")
+
+
+session_store = create_session_store(SESSION_BACKEND, invalidation_bus)
@@ -0,0 +1,129 @@
+import json
+from tortoise import connections
+from config import WISHLIST_CACHE_SIZE, WISHLIST_CACHE_TTL
+from .assets import asset_url
+from .cache import TTLCache
+from .image_service import thumbnail_path
+from .invalidation_bus import invalidation_bus
+
+# Wishlisted product ids per customer. Writes are broadcast on the invalidation
+# bus and every worker drops its copy
+wishlist_cache = TTLCache(maxsize=WISHLIST_CACHE_SIZE, ttl=WISHLIST_CACHE_TTL)
+
+# Counts invalidations. A fill is only stored when its customer was not
+# invalidated after the fill started, otherwise it may hold the old ids
+wishlist_invalidations = 0
+wishlist_invalidated_at = TTLCache(maxsize=WISHLIST_CACHE_SIZE, ttl=WISHLIST_CACHE_TTL)
+wishlist_reset_at = 0
+
+# Invalidation bus topic, events carry the customer whose wishlist changed
+WISHLIST_TOPIC = "wishlist"
+
+# Page size when a cursor is given without per_page
+WISHLIST_PAGE_SIZE = 24
+
+
+def drop_cached_wishlist(event: dict | None):
+    global wishlist_invalidations, wishlist_reset_at
+    wishlist_invalidations += 1
+    if event is None:
+        wishlist_reset_at = wishlist_invalidations
+        wishlist_cache.clear()
+    else:
+        wishlist_invalidated_at.set(event["customer_id"], wishlist_invalidations)
+        wishlist_cache.pop(event["customer_id"])
+
+
+invalidation_bus.subscribe(WISHLIST_TOPIC, drop_cached_wishlist)
+
+
+async def invalidate_wishlist(customer_id: int):
+    await invalidation_bus.publish(WISHLIST_TOPIC, customer_id=customer_id)
+
+
+async def get_wishlist_ids(customer_id: int) -> set[int]:
+    product_ids = wishlist_cache.get(customer_id)
+    if product_ids is None:
+        started_at = wishlist_invalidations
+        rows = await connections.get("default").execute_query_dict(
+            "SELECT product_id FROM wishlist WHERE customer_id = $1", [customer_id]
+        )
+        product_ids = {row["product_id"] for row in rows}
+        invalidated_at = max(
+            wishlist_reset_at, wishlist_invalidated_at.get(customer_id, 0)
+        )
+        if invalidated_at <= started_at:
+            wishlist_cache.set(customer_id, product_ids)
+    return product_ids
+
+
+# Every requested slug with whether the customer wishlisted it, in one query
+WISHLIST_MEMBERSHIP_SQL = """
+SELECT p.slug, w.id IS NOT NULL AS in_wishlist
+FROM products p
+LEFT JOIN wishlist w ON w.product_id = p.id AND w.customer_id = $1
+WHERE p.slug = ANY($2)
+"""
+
+
+async def get_wishlist_membership(customer_id: int, slugs: list[str]) -> dict:
+    rows = await connections.get("default").execute_query_dict(
+        WISHLIST_MEMBERSHIP_SQL, [customer_id, slugs]
+    )
+    members = {row["slug"] for row in rows if row["in_wishlist"]}
+    return {slug: slug in members for slug in dict.fromkeys(slugs)}
+
+
+# Keyset page of a wishlist on wishlist.id with the first image and the size
+# availability of every product
+WISHLIST_PAGE_SQL = """
+SELECT w.id AS wishlist_id, p.name, p.slug, p.price, p.type,
+       first_image.path AS image, first_image.variants,
+       COALESCE(stock.available, json_build_object()) AS size_available
+FROM wishlist w
+JOIN products p ON p.id = w.product_id
+LEFT JOIN LATERAL (
+    SELECT i.path, i.variants FROM images i
+    WHERE i.product_id = p.id
+    ORDER BY i.id
+    LIMIT 1
+) first_image ON TRUE
+LEFT JOIN LATERAL (
+    SELECT json_object_agg(s.size, inv.quantity > 0 ORDER BY inv.id) AS available
+    FROM inventory inv JOIN sizes s ON s.id = inv.size_id
+    WHERE inv.product_id = p.id
+) stock ON TRUE
+WHERE w.customer_id = $1 AND w.id > $2
+ORDER BY w.id
+LIMIT $3
+"""
+
+
+async def fetch_wishlist_page(
+    customer_id: int, per_page: int | None, cursor: int | None = None
+) -> dict:
+    # Without per_page the whole wishlist is returned, LIMIT NULL is no limit
+    limit = None if per_page is None else per_page + 1
+    rows = await connections.get("default").execute_query_dict(
+        WISHLIST_PAGE_SQL, [customer_id, cursor or 0, limit]
+    )
+    has_next_page = per_page is not None and len(rows) > per_page
+    rows = rows[:per_page]
+    return {
+        "wishlist": [
+            {
+                "name": row["name"],
+                "slug": row["slug"],
+                "price": row["price"],
+                "image": (
+                    asset_url(thumbnail_path(row["image"], row["variants"]))
+                    if row["image"] is not None
+                    else None
+                ),
+                "type": row["type"],
+                "sizeAvailable": json.loads(row["size_available"]),
+            }
+            for row in rows
+        ],
+        "nextCursor": rows[-1]["wishlist_id"] if has_next_page else None,
+    }